@@ -0,0 +1,96 @@
+import numpy as np
+import math
+from resampling import get_scheme
+
+# K independent filters (one per tracked teacher / hypothesis) stepped together.
+# particles: (K, 3, N) rows x, y, theta in each student's local frame
+# weights:   (K, N)
+
+class BatchPFEstimator:
+    def __init__(self, K=1, N=100, process_std=[0.05, 0.05], measurement_std=0.5,
+                 resampling='multinomial', seed=None):
+        self._K = int(K)
+        self._N = int(N)
+        self.rng = np.random.default_rng(seed)
+        self._resample_fn = get_scheme(resampling)
+        self.particles = self.rng.normal(scale=1.0, size=(self._K, 3, self._N))
+        self.particles[:, 2, :] = self.rng.uniform(-math.pi, math.pi, (self._K, self._N))
+        self.weights = np.ones((self._K, self._N)) / self._N
+        self.process_std = np.array(process_std)
+        self.measurement_std = measurement_std
+        self.est = np.zeros((self._K, 3))
+
+    @property
+    def K(self):
+        return self._K
+
+    @property
+    def N(self):
+        return self._N
+
+    def _column(self, value):
+        # scalar or (K,) -> (K, 1) so it broadcasts against (K, N)
+        return np.broadcast_to(np.asarray(value, dtype=float), (self._K,)).reshape(self._K, 1)
+
+    def resample(self, rows=None):
+        if rows is None:
+            rows = np.arange(self._K)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        if rows.size == 0:
+            return
+        # one vectorized draw for every selected row
+        indices = self._resample_fn(self.weights[rows], rng=self.rng)
+        self.particles[rows] = np.take_along_axis(self.particles[rows], indices[:, None, :], axis=2)
+        self.weights[rows] = 1.0 / self._N
+
+    def predict(self, dd, dtheta):
+        shape = (self._K, self._N)
+        dd_noisy = self._column(dd) + self.rng.normal(scale=self.process_std[0], size=shape)
+        dtheta_noisy = self._column(dtheta) + self.rng.normal(scale=self.process_std[1], size=shape)
+
+        x = self.particles[:, 0, :]
+        y = self.particles[:, 1, :]
+        x -= dd_noisy
+
+        cos_r = np.cos(-dtheta_noisy)
+        sin_r = np.sin(-dtheta_noisy)
+        x_prev = x.copy()
+        y_prev = y.copy()
+        self.particles[:, 0, :] = x_prev * cos_r - y_prev * sin_r
+        self.particles[:, 1, :] = x_prev * sin_r + y_prev * cos_r
+
+        th = self.particles[:, 2, :]
+        th -= dtheta_noisy
+        self.particles[:, 2, :] = np.arctan2(np.sin(th), np.cos(th))
+
+    def update_weights(self, measured_x, measured_y):
+        dx = self.particles[:, 0, :] - self._column(measured_x)
+        dy = self.particles[:, 1, :] - self._column(measured_y)
+        sq = dx**2 + dy**2
+        coeff = 1.0 / (self.measurement_std * np.sqrt(2 * np.pi))
+        un = coeff * np.exp(-0.5 * sq / (self.measurement_std ** 2)) + 1e-12
+        self.weights *= un
+        self.weights /= np.sum(self.weights, axis=1, keepdims=True)
+
+    def neff(self):
+        return 1.0 / np.sum(self.weights ** 2, axis=1)
+
+    def predict_trajectory(self, horizon_steps, est_state):
+        # (K, horizon_steps, 2) straight-line rollouts, same step as PFEstimator
+        step = 0.05
+        s = step * np.arange(1, horizon_steps + 1)
+        x0 = est_state[:, 0:1]
+        y0 = est_state[:, 1:2]
+        th = est_state[:, 2:3]
+        return np.stack((x0 + s * np.cos(th), y0 + s * np.sin(th)), axis=2)
+
+    def update_state(self, dd, dtheta, measured_x, measured_y, horizon_steps=40):
+        self.predict(dd, dtheta)
+        self.update_weights(measured_x, measured_y)
+        self.est = np.einsum('kdn,kn->kd', self.particles, self.weights)
+        est_x, est_y, est_theta = self.est[:, 0], self.est[:, 1], self.est[:, 2]
+        self.resample(self.neff() < (self._N / 2.0))
+        trajectory = self.predict_trajectory(horizon_steps, self.est)
+        return est_x, est_y, est_theta, trajectory
@@ -0,0 +1,76 @@
+import math
+import numpy as np
+
+# Path the teacher drove, as a bounded buffer of its past estimated positions
+# in the current student frame, oldest first. Every tick the whole buffer is
+# carried into the new student frame with one rigid transform (the same one
+# PFEstimator.predict applies to its particles), points the student has
+# driven past are dropped from the front, and the new estimate is appended
+# once it is `spacing` away from the newest point.
+#
+# Live points are rows [start, end) of a (2 * capacity, 2) array; when the
+# end reaches the array's end the live rows are moved to the front, so path()
+# is always one contiguous view and appends stay O(1) amortized.
+
+
+class BreadcrumbPath:
+    def __init__(self, capacity=2048, spacing=0.05):
+        self.capacity = int(capacity)
+        self.spacing = spacing
+        self._buf = np.empty((2 * self.capacity, 2))
+        self._scratch = np.empty((2 * self.capacity, 2))
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def path(self):
+        # (n, 2) view, oldest breadcrumb first
+        return self._buf[self._start:self._end]
+
+    def move(self, dd, dtheta):
+        # student drove dd along its x axis and turned by dtheta:
+        # p' = R(-dtheta) (p - (dd, 0))
+        n = self._end - self._start
+        if n == 0:
+            return
+        pts = self._buf[self._start:self._end]
+        c, s = math.cos(dtheta), math.sin(dtheta)
+        pts[:, 0] -= dd
+        np.matmul(pts, np.array([[c, -s], [s, c]]), out=self._scratch[:n])
+        pts[...] = self._scratch[:n]
+
+    def add(self, x, y):
+        if self._end > self._start:
+            lx, ly = self._buf[self._end - 1]
+            if math.hypot(x - lx, y - ly) < self.spacing:
+                return
+        if self._end == self._buf.shape[0]:
+            n = self._end - self._start
+            self._buf[:n] = self._buf[self._start:self._end]
+            self._start, self._end = 0, n
+        self._buf[self._end] = x, y
+        self._end += 1
+        if self._end - self._start > self.capacity:
+            self._start += 1
+
+    def drop_passed(self):
+        # breadcrumbs behind the student (x <= 0) have been driven over;
+        # keep the newest one so the path still starts next to the student
+        pts = self.path()
+        if pts.shape[0] < 2:
+            return
+        ahead = np.flatnonzero(pts[:-1, 0] > 0.0)
+        first = ahead[0] if ahead.size else pts.shape[0] - 1
+        self._start += max(int(first) - 1, 0)
+
+    def update(self, dd, dtheta, est_x, est_y):
+        # one control tick: ego-motion, prune, append the new teacher estimate
+        self.move(dd, dtheta)
+        self.drop_passed()
+        self.add(est_x, est_y)
+        return self.path()
@@ -0,0 +1,259 @@
+import math
+from statistics import NormalDist
+import numpy as np
+from pf_state_estimator import PFEstimator
+from profiling import NULL_PROFILER
+
+# Gaussian counterparts of PFEstimator with the same update_state /
+# update_state_obs interface and the same motion model: the teacher state
+# (x, y, theta) lives in the student frame, which moves by dd along x and
+# turns by dtheta every tick, with process noise on dd and dtheta.
+#
+# HybridEstimator runs the particle filter while the posterior may be
+# multimodal and an EKF once the cloud is a single tight blob, so the steady
+# state costs O(1) per tick instead of O(N).
+
+
+def chi2_gate(dof, prob):
+    # chi-square quantile for 1 or 2 degrees of freedom (closed forms)
+    if dof == 1:
+        return NormalDist().inv_cdf(0.5 + 0.5 * prob) ** 2
+    if dof == 2:
+        return -2.0 * math.log(1.0 - prob)
+    raise ValueError(f"no closed-form gate for {dof} degrees of freedom")
+
+
+def _inv_small(S):
+    # 1x1 / 2x2 inverse in closed form; np.linalg costs ~10 us per call here
+    if S.shape[0] == 1:
+        return 1.0 / S
+    a, b, c, d = S.ravel().tolist()
+    det = a * d - b * c
+    return np.array([[d, -b], [-c, a]]) / det
+
+
+class EKFEstimator:
+    def __init__(self, process_std=[0.05, 0.05], measurement_std=0.5, mean=None, cov=None, profiler=None):
+        self.process_std = np.array(process_std, dtype=float)
+        self.measurement_std = measurement_std
+        # same prior as PFEstimator: N(0, 1) position, uniform heading
+        self.x = np.zeros(3) if mean is None else np.array(mean, dtype=float)
+        self.P = np.diag([1.0, 1.0, math.pi ** 2 / 3]) if cov is None else np.array(cov, dtype=float)
+        self.est = self.x
+        # normalized innovation squared of the last update (NaN if none)
+        self.last_nis = math.nan
+        # bearing is undefined at the prior mean (the origin), so without a
+        # given mean the first ranged camera fix initializes the position
+        self._fixed = mean is not None
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+        self._arc = None
+
+    def reset(self, mean, cov):
+        self.x = np.array(mean, dtype=float)
+        self.P = np.array(cov, dtype=float)
+        self._fixed = True
+
+    def _init_from_obs(self, obs):
+        b, r = obs.bearing_rad, obs.range_m
+        c, s = math.cos(b), math.sin(b)
+        self.x[0], self.x[1] = r * c, r * s
+        J = np.array([[c, -r * s], [s, r * c]])
+        self.P[:2, :2] = (J * [obs.range_var, obs.bearing_var]) @ J.T
+        self.P[:2, 2] = self.P[2, :2] = 0.0
+        self._fixed = True
+
+    def predict(self, dd, dtheta):
+        # x' = R(-dtheta) (x - dd, y), theta' = theta - dtheta
+        c, s = math.cos(dtheta), math.sin(dtheta)
+        x, y, th = self.x
+        xs = x - dd
+        xn, yn = c * xs + s * y, -s * xs + c * y
+        self.x = np.array([xn, yn, math.remainder(th - dtheta, 2 * math.pi)])
+        F = np.array([[c, s, 0.0], [-s, c, 0.0], [0.0, 0.0, 1.0]])
+        # Jacobian w.r.t. the (dd, dtheta) noise
+        G = np.array([[-c, yn], [s, -xn], [0.0, -1.0]])
+        self.P = F @ self.P @ F.T + (G * self.process_std ** 2) @ G.T
+
+    def innovation(self, z, h, H, R):
+        # -> (residual, inverse innovation covariance, NIS) of z against h
+        r = z - h
+        S_inv = _inv_small(H @ self.P @ H.T + R)
+        return r, S_inv, float(r @ S_inv @ r)
+
+    def _correct(self, r, S_inv, H):
+        PHt = self.P @ H.T
+        K = PHt @ S_inv
+        self.x = self.x + K @ r
+        self.x[2] = math.remainder(self.x[2], 2 * math.pi)
+        P = self.P - K @ PHt.T
+        self.P = 0.5 * (P + P.T)
+
+    def position_model(self, measured_x, measured_y):
+        H = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+        return (np.array([measured_x, measured_y]), self.x[:2].copy(), H,
+                np.eye(2) * self.measurement_std ** 2)
+
+    def bearing_range_model(self, obs):
+        # bearing (+left) and, when available, range of the teacher position
+        x, y = self.x[0], self.x[1]
+        r2 = max(x * x + y * y, 1e-9)
+        r = math.sqrt(r2)
+        z, h = [obs.bearing_rad], [math.atan2(y, x)]
+        H, R = [[-y / r2, x / r2, 0.0]], [obs.bearing_var]
+        if obs.range_m is not None and obs.range_var is not None and np.isfinite(obs.range_m):
+            z.append(obs.range_m)
+            h.append(r)
+            H.append([x / r, y / r, 0.0])
+            R.append(obs.range_var)
+        z, h = np.array(z), np.array(h)
+        # bearing residual wrapped to [-pi, pi]
+        z[0] = h[0] + math.remainder(z[0] - h[0], 2 * math.pi)
+        return z, h, np.array(H), np.diag(R)
+
+    def update(self, model):
+        z, h, H, R = model
+        r, S_inv, self.last_nis = self.innovation(z, h, H, R)
+        self._correct(r, S_inv, H)
+
+    def update_state(self, dd, dtheta, measured_x, measured_y, horizon_steps=40):
+        prof = self.profiler
+        with prof.section('kf_predict'):
+            self.predict(dd, dtheta)
+        with prof.section('kf_update'):
+            self.update(self.position_model(measured_x, measured_y))
+        return self._finish_update(horizon_steps)
+
+    def update_state_obs(self, dd, dtheta, obs, horizon_steps=40):
+        prof = self.profiler
+        with prof.section('kf_predict'):
+            self.predict(dd, dtheta)
+        self.last_nis = math.nan
+        if obs is not None and obs.visible:
+            with prof.section('kf_update'):
+                if not self._fixed and obs.range_m is not None and obs.range_var is not None \
+                        and np.isfinite(obs.range_m):
+                    self._init_from_obs(obs)
+                else:
+                    self.update(self.bearing_range_model(obs))
+        return self._finish_update(horizon_steps)
+
+    def _finish_update(self, horizon_steps):
+        self.est = self.x
+        est_x, est_y, est_theta = self.x
+        with self.profiler.section('trajectory'):
+            # straight line along theta, PFEstimator's 'cv' trajectory
+            if self._arc is None or self._arc.shape[0] != horizon_steps:
+                self._arc = 0.05 * np.arange(1, horizon_steps + 1)
+            trajectory = np.empty((horizon_steps, 2))
+            np.multiply(self._arc, math.cos(est_theta), out=trajectory[:, 0])
+            np.multiply(self._arc, math.sin(est_theta), out=trajectory[:, 1])
+            trajectory += self.x[:2]
+        return est_x, est_y, est_theta, trajectory
+
+
+class HybridEstimator:
+    def __init__(self, N=200, process_std=[0.05, 0.05], measurement_std=0.5, seed=None,
+                 collapse_spread=0.25, collapse_neff=0.5, collapse_ticks=10, gate_prob=0.999,
+                 expand_inflation=4.0, recovery_fraction=0.5, profiler=None, **pf_kwargs):
+        # PF -> EKF once, for collapse_ticks ticks in a row, the cloud's
+        # position spread (sqrt of the largest xy covariance eigenvalue) is
+        # below collapse_spread and Neff is above collapse_neff * N.
+        # EKF -> PF on an occluded tick or when a measurement's NIS exceeds
+        # the gate_prob chi-square quantile: particles are redrawn from the
+        # last Gaussian with its covariance scaled by expand_inflation, plus
+        # recovery_fraction of them around the measurement itself.
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+        self.pf = PFEstimator(N=N, process_std=process_std, measurement_std=measurement_std, seed=seed,
+                              profiler=self.profiler, **pf_kwargs)
+        self.kf = EKFEstimator(process_std=process_std, measurement_std=measurement_std, profiler=self.profiler)
+        self.rng = self.pf.rng
+        self.collapse_spread = collapse_spread
+        self.collapse_neff = collapse_neff
+        self.collapse_ticks = int(collapse_ticks)
+        self.gate_prob = gate_prob
+        self.expand_inflation = expand_inflation
+        self.recovery_fraction = recovery_fraction
+        self.mode = 'pf'
+        self._unimodal_ticks = 0
+        self.collapses = 0
+        self.expansions = 0
+        self.est = self.pf.est
+
+    @property
+    def N(self):
+        # particle count in PF mode, 0 while the EKF runs
+        return self.pf.N if self.mode == 'pf' else 0
+
+    def _pf_tick(self, out):
+        mean, cov = self.pf.gaussian()
+        spread = math.sqrt(max(np.linalg.eigvalsh(cov[:2, :2])[-1], 0.0))
+        if spread < self.collapse_spread and self.pf.last_neff >= self.collapse_neff * self.pf.N:
+            self._unimodal_ticks += 1
+        else:
+            self._unimodal_ticks = 0
+        if self._unimodal_ticks >= self.collapse_ticks:
+            # the estimate stays the cloud's weighted mean; its covariance
+            # is taken after resampling, which does not change it much
+            self.kf.reset(mean, cov)
+            self.mode = 'kf'
+            self.collapses += 1
+        self.est = self.pf.est
+        return out
+
+    def _expand(self, around=None):
+        # redraw particles from the (pre-tick) Gaussian, some around `around`
+        n = self.pf.N
+        cov = self.kf.P * self.expand_inflation
+        particles = self.rng.multivariate_normal(self.kf.x, cov, size=n, method='cholesky').T
+        if around is not None:
+            k = int(self.recovery_fraction * n)
+            particles[:2, :k] = np.asarray(around, dtype=float)[:, None] + \
+                self.rng.normal(scale=self.pf.measurement_std, size=(2, k))
+        particles[2] = np.remainder(particles[2] + math.pi, 2 * math.pi) - math.pi
+        self.pf.set_particles(particles)
+        self.mode = 'pf'
+        self._unimodal_ticks = 0
+        self.expansions += 1
+
+    def _gated(self, model):
+        z, h, H, R = model
+        nis = self.kf.innovation(z, h, H, R)[2]
+        return nis <= chi2_gate(len(z), self.gate_prob)
+
+    def update_state(self, dd, dtheta, measured_x, measured_y, horizon_steps=40):
+        visible = math.isfinite(measured_x) and math.isfinite(measured_y)
+        if self.mode == 'kf':
+            prior = (self.kf.x, self.kf.P)
+            self.kf.predict(dd, dtheta)
+            model = self.kf.position_model(measured_x, measured_y) if visible else None
+            if model is not None and self._gated(model):
+                self.kf.update(model)
+                out = self.kf._finish_update(horizon_steps)
+                self.est = self.kf.est
+                return out
+            self.kf.reset(*prior)
+            self._expand((measured_x, measured_y) if visible else None)
+        if visible:
+            out = self.pf.update_state(dd, dtheta, measured_x, measured_y, horizon_steps)
+        else:
+            out = self.pf.update_state_obs(dd, dtheta, None, horizon_steps)
+        return self._pf_tick(out)
+
+    def update_state_obs(self, dd, dtheta, obs, horizon_steps=40):
+        visible = obs is not None and obs.visible
+        if self.mode == 'kf':
+            prior = (self.kf.x, self.kf.P)
+            self.kf.predict(dd, dtheta)
+            if visible:
+                model = self.kf.bearing_range_model(obs)
+                if self._gated(model):
+                    self.kf.update(model)
+                    out = self.kf._finish_update(horizon_steps)
+                    self.est = self.kf.est
+                    return out
+            around = None
+            if visible and obs.range_m is not None and np.isfinite(obs.range_m):
+                around = (obs.range_m * math.cos(obs.bearing_rad), obs.range_m * math.sin(obs.bearing_rad))
+            self.kf.reset(*prior)
+            self._expand(around)
+        return self._pf_tick(self.pf.update_state_obs(dd, dtheta, obs, horizon_steps))
@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from profiling import LatencyStats
+
+# Runs perception (frame -> PerceptionObs) on a worker thread so the control
+# tick never waits for it. Per tick the controller submits frame k and takes
+# whatever observation is newest (usually frame k-1), so detection of the next
+# frame overlaps the PF and controllers on the current one. Queues hold one
+# item: a frame that was not picked up in time is replaced by the newer one,
+# and an observation older than max_age is dropped instead of being fused.
+
+
+class PerceptionPipeline:
+    def __init__(self, detect, to_obs, max_age=None, clock=time.monotonic):
+        # detect(frame) -> blob; to_obs(t, blob) -> PerceptionObs
+        self.detect = detect
+        self.to_obs = to_obs
+        self.max_age = max_age
+        self.clock = clock
+        self._frames = queue.Queue(maxsize=1)
+        self._results = queue.Queue(maxsize=1)
+        self.dropped_frames = 0
+        self.stale_obs = 0
+        self.stats = {name: LatencyStats() for name in ('queue_wait', 'detect', 'obs_age')}
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='perception', daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _replace(q, item):
+        # put, evicting the queued item if the consumer has not taken it yet
+        dropped = 0
+        while True:
+            try:
+                q.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                t, frame, submitted = self._frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if frame is None:
+                break
+            start = self.clock()
+            self.stats['queue_wait'].add(start - submitted)
+            obs = self.to_obs(t, self.detect(frame))
+            self.stats['detect'].add(self.clock() - start)
+            self._replace(self._results, (obs, submitted))
+
+    def submit(self, t, frame):
+        # t: frame timestamp passed on to to_obs (e.g. robot.getTime())
+        self.dropped_frames += self._replace(self._frames, (t, frame, self.clock()))
+
+    def latest(self):
+        # newest finished observation, or None if nothing new / too old
+        try:
+            obs, submitted = self._results.get_nowait()
+        except queue.Empty:
+            return None
+        age = self.clock() - submitted
+        self.stats['obs_age'].add(age)
+        if self.max_age is not None and age > self.max_age:
+            self.stale_obs += 1
+            return None
+        return obs
+
+    def wait_latest(self, timeout=None):
+        # blocking variant for offline / replay use
+        try:
+            obs, submitted = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.stats['obs_age'].add(self.clock() - submitted)
+        return obs
+
+    def record(self, stage, dt):
+        # latency of a stage run outside the pipeline, e.g. the control tick
+        if stage not in self.stats:
+            self.stats[stage] = LatencyStats()
+        self.stats[stage].add(dt)
+
+    def summary(self):
+        out = {name: s.summary() for name, s in self.stats.items()}
+        out['dropped_frames'] = self.dropped_frames
+        out['stale_obs'] = self.stale_obs
+        return out
+
+    def close(self):
+        self._stop.set()
+        self._replace(self._frames, (None, None, self.clock()))
+        self._worker.join(timeout=1.0)
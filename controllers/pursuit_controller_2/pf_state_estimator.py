@@ -1,24 +1,235 @@
 import numpy as np
 import math
+from statistics import NormalDist
+from resampling import get_scheme, multinomial
+from profiling import NULL_PROFILER
 
 class PFEstimator:
-    def __init__(self, N=100, process_std=[0.05, 0.05], measurement_std=0.5):
+    def __init__(self, N=100, process_std=[0.05, 0.05], measurement_std=0.5,
+                 resampling='multinomial', seed=None, workspace=False, log_weights=False,
+                 adaptive=False, n_min=50, n_max=5000, kld_epsilon=0.05, kld_delta=0.01,
+                 kld_bin=(0.2, 0.2), motion='cv', track_window=120, max_turn_rate=2.0,
+                 profiler=None):
         self._N = int(N)
-        self.particles = np.random.normal(scale=1.0, size=(3, self._N))
-        self.particles[2, :] = np.random.uniform(-math.pi, math.pi, self._N)
+        self.rng = np.random.default_rng(seed)
+        self._resample_fn = get_scheme(resampling)
+        self.particles = self.rng.normal(scale=1.0, size=(3, self._N))
+        self.particles[2, :] = self.rng.uniform(-math.pi, math.pi, self._N)
         self.weights = np.ones((self._N,)) / self._N
         self.process_std = np.array(process_std)
         self.measurement_std = measurement_std
         self.est = np.array([0.0, 0.0, 0.0])
+        # log-domain mode keeps normalized log weights as the source of truth;
+        # self.weights is their exp, refreshed on every update
+        self.log_weights = np.full(self._N, -math.log(self._N)) if log_weights else None
+        self._ws = None
+        if workspace:
+            self._alloc_workspace()
+        # KLD-sampling: N follows the number of occupied (x, y[, theta]) bins
+        self.adaptive = adaptive
+        self._n_min = int(n_min)
+        self._n_max = int(n_max)
+        self._kld_epsilon = kld_epsilon
+        self._kld_z = NormalDist().inv_cdf(1.0 - kld_delta)
+        self._kld_bin = np.array(kld_bin, dtype=float).reshape(-1, 1)
+        # trajectory model: 'cv' straight line along est_theta, 'ctrv' constant
+        # turn rate. Particle headings are never corrected by a position
+        # measurement, so ctrv takes heading and turn rate (rad per metre) from
+        # the recent track of the cloud mean, kept in the current student frame
+        if motion not in ('cv', 'ctrv'):
+            raise ValueError(f"unknown motion model '{motion}', expected 'cv' or 'ctrv'")
+        self.motion = motion
+        self.track = np.empty((0, 2))
+        self._track_window = int(track_window)
+        self._max_turn_rate = max_turn_rate
+        self.track_heading = None
+        self.turn_rate = 0.0
+        self.last_neff = float(self._N)
+        # per-stage timers, see profiling.py
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+
+    @property
+    def N(self):
+        return self._N
+
+    def _alloc_workspace(self):
+        # scratch rows reused every tick: dd noise, dtheta noise, cos, sin, tmp0, tmp1
+        # (the first two double as the resampler's cdf and draw points), the
+        # resampled indices, and a second particle buffer that resample()
+        # gathers into and swaps with
+        self._ws = np.empty((6, self._N))
+        self._ws_idx = np.empty(self._N, dtype=np.intp)
+        self._ws_particles = np.empty_like(self.particles)
 
     def resample(self):
-        indices = np.random.choice(self._N, size=self._N, p=self.weights)
-        self.particles = self.particles[:, indices]
+        if self._ws is None:
+            indices = self._resample_fn(self.weights, rng=self.rng)
+            self.particles = self.particles[:, indices]
+        else:
+            indices = self._resample_fn(self.weights, rng=self.rng, out=self._ws_idx, work=self._ws[:2])
+            # mode='clip' (indices are in range): take buffers out under 'raise'
+            np.take(self.particles, indices, axis=1, out=self._ws_particles, mode='clip')
+            self.particles, self._ws_particles = self._ws_particles, self.particles
         self.weights.fill(1.0 / self._N)
+        if self.log_weights is not None:
+            self.log_weights.fill(-math.log(self._N))
+
+    def set_particles(self, particles):
+        # replace the cloud with (3, n) equally weighted particles
+        n = particles.shape[1]
+        resized = n != self._N
+        self.particles = np.array(particles, dtype=float)
+        self._N = n
+        self.weights = np.full(n, 1.0 / n)
+        if self.log_weights is not None:
+            self.log_weights = np.full(n, -math.log(n))
+        if self._ws is not None and resized:
+            self._alloc_workspace()
+
+    def gaussian(self):
+        # weighted mean (3,) and covariance (3, 3) of the cloud
+        mean = self.particles @ self.weights
+        d = self.particles - mean[:, None]
+        return mean, (d * self.weights) @ d.T
+
+    def _kld_required(self, k):
+        # Fox 2003: samples needed so that, with probability 1 - delta, the KL
+        # divergence between sample and true posterior stays below epsilon
+        k1 = np.maximum(k - 1, 1)
+        a = 2.0 / (9.0 * k1)
+        return k1 / (2.0 * self._kld_epsilon) * (1.0 - a + np.sqrt(a) * self._kld_z) ** 3
+
+    def _bin_keys(self, particles):
+        # one int64 key per particle, 21 bits per binned dimension
+        cells = np.floor(particles[:self._kld_bin.shape[0]] / self._kld_bin).astype(np.int64)
+        keys = np.zeros(particles.shape[1], dtype=np.int64)
+        for row in cells:
+            keys = (keys << 21) | (row & 0x1FFFFF)
+        return keys
+
+    def _kld_count(self, keys):
+        # Fox bound for the bins occupied by these keys, clipped to [n_min, n_max]
+        k = np.unique(keys).size
+        return int(min(max(math.ceil(self._kld_required(k)), self._n_min), self._n_max))
+
+    def kld_grow(self):
+        # the cloud can spread without degenerating (occlusion, fast turns):
+        # when the bins it occupies need more than N particles, append draws
+        # from the weighted cloud and keep every existing particle. The old
+        # weights are scaled by N / n so both parts carry their share.
+        n = self._kld_count(self._bin_keys(self.particles))
+        if n <= self._N:
+            return
+        extra = multinomial(self.weights, rng=self.rng, n=n - self._N)
+        self.particles = np.concatenate((self.particles, self.particles[:, extra]), axis=1)
+        weights = np.full(n, 1.0 / n)
+        np.multiply(self.weights, self._N / n, out=weights[:self._N])
+        self.weights = weights
+        if self.log_weights is not None:
+            self.log_weights = np.log(weights)
+        self._N = n
+        if self._ws is not None:
+            self._alloc_workspace()
+
+    def kld_resample(self):
+        # KLD-sampling started at the current N: the cloud is binned once, the
+        # bins hit by N iid draws give the required sample count directly, and
+        # only when that exceeds the draws so far are more drawn and the bins
+        # recounted. Prefixes of an iid sequence are themselves valid samples,
+        # so a smaller N keeps a prefix of the draws.
+        keys = self._bin_keys(self.particles)
+        draws = multinomial(self.weights, rng=self.rng, n=min(max(self._N, self._n_min), self._n_max))
+        while True:
+            n = self._kld_count(keys[draws])
+            if n <= draws.size or draws.size >= self._n_max:
+                break
+            draws = np.concatenate((draws, multinomial(self.weights, rng=self.rng, n=n - draws.size)))
+        n = min(n, draws.size)
+
+        resized = n != self._N
+        self.particles = self.particles[:, draws[:n]]
+        self._N = n
+        if resized:
+            self.weights = np.empty(n)
+            if self.log_weights is not None:
+                self.log_weights = np.empty(n)
+            if self._ws is not None:
+                self._alloc_workspace()
+        self.weights.fill(1.0 / n)
+        if self.log_weights is not None:
+            self.log_weights.fill(-math.log(n))
+
+    def _apply_log_likelihood(self, loglik):
+        # log-sum-exp normalization; loglik is used as scratch
+        lw = self.log_weights
+        np.add(lw, loglik, out=lw)
+        np.subtract(lw, lw.max(), out=lw)
+        np.exp(lw, out=self.weights)
+        total = self.weights.sum()
+        np.divide(self.weights, total, out=self.weights)
+        np.subtract(lw, math.log(total), out=lw)
+
+    def neff(self):
+        if self.log_weights is None:
+            return 1.0 / np.dot(self.weights, self.weights)
+        # 1 / sum(exp(2 * lw)) as a log-sum-exp, so it stays finite however small the weights get
+        lw = self.log_weights
+        m = lw.max()
+        scratch = np.empty(self._N) if self._ws is None else self._ws[5]
+        np.subtract(lw, m, out=scratch)
+        np.multiply(scratch, 2.0, out=scratch)
+        np.exp(scratch, out=scratch)
+        return math.exp(-(2.0 * m + math.log(scratch.sum())))
+
+    def _predict_inplace(self, dd, dtheta):
+        dn, tn, c, s, t0, t1 = self._ws
+        x, y, th = self.particles
+        self.rng.standard_normal(out=dn)
+        np.multiply(dn, self.process_std[0], out=dn)
+        np.add(dn, dd, out=dn)
+        self.rng.standard_normal(out=tn)
+        np.multiply(tn, self.process_std[1], out=tn)
+        np.add(tn, dtheta, out=tn)
+
+        np.subtract(x, dn, out=x)
+
+        # rotate by -dtheta: x' = x cos + y sin, y' = y cos - x sin
+        np.cos(tn, out=c)
+        np.sin(tn, out=s)
+        np.multiply(x, c, out=t0)
+        np.multiply(y, s, out=t1)
+        np.add(t0, t1, out=t0)
+        np.multiply(x, s, out=t1)
+        np.multiply(y, c, out=y)
+        np.subtract(y, t1, out=y)
+        np.copyto(x, t0)
+
+        np.subtract(th, tn, out=th)
+        np.add(th, math.pi, out=th)
+        np.remainder(th, 2 * math.pi, out=th)
+        np.subtract(th, math.pi, out=th)
+
+    def _update_weights_inplace(self, measured_x, measured_y):
+        t0, t1 = self._ws[4], self._ws[5]
+        np.subtract(self.particles[0], measured_x, out=t0)
+        np.square(t0, out=t0)
+        np.subtract(self.particles[1], measured_y, out=t1)
+        np.square(t1, out=t1)
+        np.add(t0, t1, out=t0)
+        np.multiply(t0, -0.5 / (self.measurement_std ** 2), out=t0)
+        if self.log_weights is not None:
+            return self._apply_log_likelihood(t0)
+        np.exp(t0, out=t0)
+        np.multiply(t0, 1.0 / (self.measurement_std * np.sqrt(2 * np.pi)), out=t0)
+        np.add(t0, 1e-12, out=t0)
+        np.multiply(self.weights, t0, out=self.weights)
+        np.divide(self.weights, self.weights.sum(), out=self.weights)
 
     def predict(self, dd, dtheta):
-        dd_noisy = dd + np.random.normal(scale=self.process_std[0], size=self._N)
-        dtheta_noisy = dtheta + np.random.normal(scale=self.process_std[1], size=self._N)
+        if self._ws is not None:
+            return self._predict_inplace(dd, dtheta)
+        dd_noisy = dd + self.rng.normal(scale=self.process_std[0], size=self._N)
+        dtheta_noisy = dtheta + self.rng.normal(scale=self.process_std[1], size=self._N)
 
         self.particles[0, :] -= dd_noisy
 
@@ -33,31 +244,134 @@ class PFEstimator:
         self.particles[2, :] = np.arctan2(np.sin(self.particles[2, :]), np.cos(self.particles[2, :]))
 
     def update_weights(self, measured_x, measured_y):
+        if self._ws is not None:
+            return self._update_weights_inplace(measured_x, measured_y)
         dx = self.particles[0, :] - measured_x
         dy = self.particles[1, :] - measured_y
         sq = dx**2 + dy**2
+        if self.log_weights is not None:
+            return self._apply_log_likelihood(-0.5 * sq / (self.measurement_std ** 2))
         coeff = 1.0 / (self.measurement_std * np.sqrt(2 * np.pi))
         un = coeff * np.exp(-0.5 * sq / (self.measurement_std ** 2)) + 1e-12
         self.weights *= un
         self.weights /= np.sum(self.weights)
 
-    def predict_trajectory(self, horizon_steps, est_state):
-        traj = []
+    def update_bearing_range(self, obs):
+        # camera measurement (PerceptionObs-like: bearing_rad +left, range_m,
+        # bearing_var, range_var) against each particle's position; range is
+        # skipped when missing. Written with out= so workspace mode stays
+        # allocation-free.
+        if self._ws is not None:
+            r, b = self._ws[4], self._ws[5]
+        else:
+            r, b = np.empty(self._N), np.empty(self._N)
+        x, y = self.particles[0], self.particles[1]
+        np.arctan2(y, x, out=b)
+        np.subtract(b, obs.bearing_rad - math.pi, out=b)
+        np.remainder(b, 2 * math.pi, out=b)
+        np.subtract(b, math.pi, out=b)
+        np.square(b, out=b)
+        np.multiply(b, -0.5 / obs.bearing_var, out=b)
+        if obs.range_m is not None and obs.range_var is not None and np.isfinite(obs.range_m):
+            np.hypot(x, y, out=r)
+            np.subtract(r, obs.range_m, out=r)
+            np.square(r, out=r)
+            np.multiply(r, -0.5 / obs.range_var, out=r)
+            np.add(b, r, out=b)
+        if self.log_weights is not None:
+            return self._apply_log_likelihood(b)
+        np.exp(b, out=b)
+        np.add(b, 1e-12, out=b)
+        np.multiply(self.weights, b, out=self.weights)
+        np.divide(self.weights, self.weights.sum(), out=self.weights)
+
+    @staticmethod
+    def _rollout(x, y, th, turn_rate, horizon_steps, step=0.05):
+        # closed-form constant-turn-rate arc; sinc keeps turn_rate == 0 exact
+        s = step * np.arange(1, horizon_steps + 1)
+        half = 0.5 * np.asarray(turn_rate)[..., None] * s
+        f = s * np.sinc(half / np.pi)
+        th = np.asarray(th)[..., None] + half
+        return np.stack((np.asarray(x)[..., None] + f * np.cos(th),
+                         np.asarray(y)[..., None] + f * np.sin(th)), axis=-1)
+
+    def predict_trajectory(self, horizon_steps, est_state, turn_rate=0.0):
+        # (horizon_steps, 2) points 0.05 m apart
         x, y, th = est_state
-        step = 0.05
-        for _ in range(horizon_steps):
-            x += step * math.cos(th)
-            y += step * math.sin(th)
-            traj.append((x, y))
-        return traj
+        return self._rollout(x, y, th, turn_rate, horizon_steps)
+
+    def sample_trajectories(self, horizon_steps, n_samples=50):
+        # (n_samples, horizon_steps, 2) rollouts of particles drawn by weight,
+        # each from its own position, for uncertainty bands around the estimate
+        idx = multinomial(self.weights, rng=self.rng, n=n_samples)
+        px, py, pth = self.particles[:, idx]
+        if self.motion == 'ctrv' and self.track_heading is not None:
+            pth = np.full(n_samples, self.track_heading)
+        return self._rollout(px, py, pth, self.turn_rate, horizon_steps)
+
+    def _update_track(self, dd, dtheta):
+        # carry the past estimates into the new student frame, append the new one
+        if self.track.shape[0]:
+            c, s = math.cos(dtheta), math.sin(dtheta)
+            x = self.track[:, 0] - dd
+            y = self.track[:, 1]
+            self.track = np.stack((x * c + y * s, y * c - x * s), axis=1)
+        self.track = np.vstack((self.track, self.est[None, :2]))[-self._track_window:]
+        if self.track.shape[0] < 3:
+            return
+        # signed curvature through the means of the first, middle and last thirds
+        a, b, c = (part.mean(axis=0) for part in np.array_split(self.track, 3))
+        ab, bc, ac = b - a, c - b, c - a
+        denom = np.linalg.norm(ab) * np.linalg.norm(bc) * np.linalg.norm(ac)
+        if denom < 1e-9:
+            return
+        cross = ab[0] * bc[1] - ab[1] * bc[0]
+        self.turn_rate = float(np.clip(2.0 * cross / denom, -self._max_turn_rate, self._max_turn_rate))
+        # chord direction plus half the turn over the chord = tangent at its end
+        self.track_heading = math.atan2(bc[1], bc[0]) + 0.5 * self.turn_rate * np.linalg.norm(bc)
 
     def update_state(self, dd, dtheta, measured_x, measured_y, horizon_steps=40):
-        self.predict(dd, dtheta)
-        self.update_weights(measured_x, measured_y)
-        self.est = np.average(self.particles, axis=1, weights=self.weights)
+        prof = self.profiler
+        with prof.section('pf_predict'):
+            self.predict(dd, dtheta)
+        with prof.section('pf_update'):
+            self.update_weights(measured_x, measured_y)
+        return self._finish_update(dd, dtheta, horizon_steps, True)
+
+    def update_state_obs(self, dd, dtheta, obs, horizon_steps=40):
+        # same as update_state but with a camera observation; an invisible (or
+        # missing) observation is a predict-only tick
+        prof = self.profiler
+        with prof.section('pf_predict'):
+            self.predict(dd, dtheta)
+        measured = obs is not None and obs.visible
+        if measured:
+            with prof.section('pf_update'):
+                self.update_bearing_range(obs)
+        return self._finish_update(dd, dtheta, horizon_steps, measured)
+
+    def _finish_update(self, dd, dtheta, horizon_steps, measured):
+        prof = self.profiler
+        self.est = self.particles @ self.weights
         est_x, est_y, est_theta = self.est
-        neff = 1.0 / np.sum(self.weights ** 2)
-        if neff < (self._N / 2.0):
-            self.resample()
-        trajectory = self.predict_trajectory(horizon_steps, self.est)
+        with prof.section('pf_resample'):
+            # Neff of the updated weights, before resampling resets them
+            self.last_neff = self.neff()
+            if self.last_neff < (self._N / 2.0):
+                if self.adaptive:
+                    self.kld_resample()
+                else:
+                    self.resample()
+            elif self.adaptive and not measured:
+                # predict-only tick: the weights cannot degenerate, but the
+                # cloud spreads, so N is checked against its bins instead
+                self.kld_grow()
+        with prof.section('trajectory'):
+            if self.motion == 'ctrv':
+                self._update_track(dd, dtheta)
+            if self.motion == 'ctrv' and self.track_heading is not None:
+                trajectory = self.predict_trajectory(horizon_steps, (est_x, est_y, self.track_heading),
+                                                     self.turn_rate)
+            else:
+                trajectory = self.predict_trajectory(horizon_steps, self.est)
         return est_x, est_y, est_theta, trajectory
\ No newline at end of file
@@ -1,7 +1,8 @@
 import time
+import numpy as np
 
 class PIDController:
-    def __init__(self, Kp, Ki, Kd, target, output_min, output_max):
+    def __init__(self, Kp, Ki, Kd, target, output_min, output_max, clock=time.monotonic):
         self.Kp = Kp
         self.Ki = Ki
         self.Kd = Kd
@@ -10,13 +11,19 @@ class PIDController:
         self.output_max = output_max
         self._integral = 0.0
         self._last_error = 0.0
-        self._last_time = time.monotonic()
+        self._clock = clock
+        self._last_time = clock()
+        self._last_output = output_min
 
-    def update(self, current_value):
-        current_time = time.monotonic()
-        dt = current_time - self._last_time
-        if dt == 0:
-            return self.output_min
+    def update(self, current_value, dt=None):
+        # dt: step length from the caller (e.g. Webots timestep / 1000);
+        # None measures it with the clock. The clock is read either way, so
+        # the two modes can be mixed without a stale _last_time
+        current_time = self._clock()
+        if dt is None:
+            dt = current_time - self._last_time
+        if dt <= 0:
+            return self._last_output
         error = current_value - self.target
         p = self.Kp * error
         self._integral += error * dt
@@ -28,4 +35,44 @@ class PIDController:
         clamped = max(min(output, self.output_max), self.output_min)
         if output != clamped:
             self._integral -= error * dt
-        return clamped
\ No newline at end of file
+        self._last_output = clamped
+        return clamped
+
+
+class PIDBank:
+    # K independent PIDControllers stepped with one set of array operations.
+    # Gains, targets and limits are scalars or (K,) arrays; dt is supplied.
+    def __init__(self, K, Kp, Ki, Kd, target, output_min, output_max):
+        self.K = int(K)
+        shape = (self.K,)
+        self.Kp = np.broadcast_to(np.asarray(Kp, dtype=float), shape).copy()
+        self.Ki = np.broadcast_to(np.asarray(Ki, dtype=float), shape).copy()
+        self.Kd = np.broadcast_to(np.asarray(Kd, dtype=float), shape).copy()
+        self.target = np.broadcast_to(np.asarray(target, dtype=float), shape).copy()
+        self.output_min = np.broadcast_to(np.asarray(output_min, dtype=float), shape).copy()
+        self.output_max = np.broadcast_to(np.asarray(output_max, dtype=float), shape).copy()
+        self._integral = np.zeros(shape)
+        self._last_error = np.zeros(shape)
+        self._last_output = self.output_min.copy()
+
+    def update(self, current_value, dt):
+        # current_value (K,), dt scalar or (K,); controllers with dt <= 0 hold
+        # their last output, like PIDController
+        dt = np.broadcast_to(np.asarray(dt, dtype=float), (self.K,))
+        live = dt > 0
+        safe_dt = np.where(live, dt, 1.0)
+        error = np.asarray(current_value, dtype=float) - self.target
+        integral = self._integral + error * dt
+        output = self.Kp * error + self.Ki * integral + self.Kd * ((error - self._last_error) / safe_dt)
+        clamped = np.clip(output, self.output_min, self.output_max)
+        # anti-windup: keep the old integral where the output saturated
+        integral = np.where(output != clamped, self._integral, integral)
+        self._integral = np.where(live, integral, self._integral)
+        self._last_error = np.where(live, error, self._last_error)
+        self._last_output = np.where(live, clamped, self._last_output)
+        return self._last_output.copy()
+
+    def reset(self):
+        self._integral.fill(0.0)
+        self._last_error.fill(0.0)
+        self._last_output = self.output_min.copy()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import os
+import time
+import numpy as np
+
+# Per-tick profiling for the control loop. Code under test is wrapped in
+# `with profiler.section(name):`; each name keeps its last `size` durations
+# in a fixed ring for p50/p99/max. A disabled profiler hands out one shared
+# no-op section, so instrumented code costs a method call per section when
+# profiling is off. PURSUIT_PROFILE=1 turns it on in the Webots controller.
+
+
+class LatencyStats:
+    # last `size` samples (seconds) of one stage in a fixed ring
+    def __init__(self, size=1024):
+        self._buf = np.zeros(size)
+        self.count = 0
+
+    def add(self, dt):
+        self._buf[self.count % self._buf.shape[0]] = dt
+        self.count += 1
+
+    def summary(self):
+        n = min(self.count, self._buf.shape[0])
+        if n == 0:
+            return {'count': 0}
+        s = self._buf[:n]
+        p50, p99 = np.percentile(s, [50, 99])
+        return {'count': self.count, 'mean_ms': 1e3 * s.mean(), 'p50_ms': 1e3 * p50,
+                'p99_ms': 1e3 * p99, 'max_ms': 1e3 * s.max()}
+
+
+class _NullSection:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    __slots__ = ('_profiler', '_stats', '_start')
+
+    def __init__(self, profiler, stats):
+        self._profiler = profiler
+        self._stats = stats
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = self._profiler.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self._stats.add(self._profiler.clock() - self._start)
+        return False
+
+
+class _TickSection(_Section):
+    __slots__ = ()
+
+    def __exit__(self, *exc):
+        dt = self._profiler.clock() - self._start
+        self._stats.add(dt)
+        budget = self._profiler.budget
+        if budget is not None and dt > budget:
+            self._profiler.deadline_misses += 1
+        return False
+
+
+class TickProfiler:
+    def __init__(self, enabled=True, budget=None, size=4096, clock=time.perf_counter):
+        # budget: seconds allowed per tick (the basic time step); a tick()
+        # section longer than that counts as a deadline miss
+        self.enabled = enabled
+        self.budget = budget
+        self.size = size
+        self.clock = clock
+        self.stats = {}
+        self._sections = {}
+        self.deadline_misses = 0
+
+    @classmethod
+    def from_env(cls, var='PURSUIT_PROFILE', **kwargs):
+        return cls(enabled=os.environ.get(var, '') not in ('', '0'), **kwargs)
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        s = self._sections.get(name)
+        if s is None:
+            s = self._sections[name] = _Section(self, self._stats(name))
+        return s
+
+    def tick(self):
+        # wraps one whole control tick
+        if not self.enabled:
+            return _NULL_SECTION
+        s = self._sections.get('tick')
+        if s is None:
+            s = self._sections['tick'] = _TickSection(self, self._stats('tick'))
+        return s
+
+    def _stats(self, name):
+        if name not in self.stats:
+            self.stats[name] = LatencyStats(self.size)
+        return self.stats[name]
+
+    def summary(self):
+        out = {name: s.summary() for name, s in self.stats.items()}
+        ticks = self.stats['tick'].count if 'tick' in self.stats else 0
+        out['deadline'] = {'budget_ms': None if self.budget is None else 1e3 * self.budget,
+                           'ticks': ticks, 'misses': self.deadline_misses}
+        return out
+
+    def report(self):
+        lines = [f"{'section':<14}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, s in self.stats.items():
+            r = s.summary()
+            if r['count']:
+                lines.append(f"{name:<14}{r['count']:>8}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}"
+                             f"{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}")
+        d = self.summary()['deadline']
+        if d['budget_ms'] is not None:
+            lines.append(f"deadline misses: {d['misses']}/{d['ticks']} ticks over {d['budget_ms']:.1f} ms")
+        return "\n".join(lines)
+
+
+# shared disabled instance, the default for instrumented classes
+NULL_PROFILER = TickProfiler(enabled=False)
@@ -1,19 +1,58 @@
-import math
+import numpy as np
+
+# The goal point is where the path first leaves the lookahead circle. The
+# crossing lies on one segment, so it is interpolated on that segment with
+# the exact circle/segment intersection rather than by snapping to the
+# nearest sample.
+
+
+def _circle_crossing(points, L_d):
+    # points (..., M, 2), L_d scalar or (...). First segment leaving the
+    # lookahead circle and the exact crossing parameter t in [0, 1] on it;
+    # valid is False when the path never crosses the circle from inside.
+    L_d = np.asarray(L_d, dtype=float)
+    d = np.hypot(points[..., 0], points[..., 1])
+    cross = (d[..., :-1] < L_d[..., None]) & (d[..., 1:] >= L_d[..., None])
+    valid = cross.any(axis=-1)
+    i = np.argmax(cross, axis=-1)
+    p0 = np.take_along_axis(points[..., :-1, :], i[..., None, None], axis=-2)[..., 0, :]
+    p1 = np.take_along_axis(points[..., 1:, :], i[..., None, None], axis=-2)[..., 0, :]
+    # |p0 + t (p1 - p0)| = L_d
+    e = p1 - p0
+    a = np.sum(e * e, axis=-1)
+    b = 2.0 * np.sum(p0 * e, axis=-1)
+    c = np.sum(p0 * p0, axis=-1) - L_d ** 2
+    disc = np.sqrt(np.maximum(b * b - 4.0 * a * c, 0.0))
+    t = np.divide(-b + disc, 2.0 * a, out=np.zeros_like(a), where=a > 0)
+    return i, np.clip(t, 0.0, 1.0), valid, d
+
 
 class PurePursuit:
     def __init__(self, L_d):
         self.L_d = L_d
 
     def _find_goal_point(self, path_points):
-        best = None
-        best_diff = float('inf')
-        for x, y in path_points:
-            d = math.hypot(x, y)
-            diff = abs(d - self.L_d)
-            if diff < best_diff:
-                best_diff = diff
-                best = (x, y)
-        return best
+        if len(path_points) == 0:
+            return None
+        pts = np.asarray(path_points, dtype=float).reshape(-1, 2)
+        d = np.hypot(pts[:, 0], pts[:, 1])
+        # single path: same crossing as _circle_crossing, with scalar
+        # arithmetic once the segment is found (short paths are overhead bound)
+        outside = d >= self.L_d
+        cross = ~outside[:-1] & outside[1:]
+        i = int(cross.argmax()) if cross.size else 0
+        if cross.size and cross[i]:
+            x0, y0 = pts[i].tolist()
+            ex, ey = (pts[i + 1] - pts[i]).tolist()
+            a = ex * ex + ey * ey
+            b = 2.0 * (x0 * ex + y0 * ey)
+            c = x0 * x0 + y0 * y0 - self.L_d ** 2
+            t = (-b + max(b * b - 4.0 * a * c, 0.0) ** 0.5) / (2.0 * a) if a > 0 else 0.0
+            t = min(max(t, 0.0), 1.0)
+            return x0 + t * ex, y0 + t * ey
+        # path never crosses the lookahead circle: nearest sample to L_d
+        xg, yg = pts[np.argmin(np.abs(d - self.L_d))]
+        return float(xg), float(yg)
 
     def update(self, v, path_points):
         gp = self._find_goal_point(path_points)
@@ -21,4 +60,24 @@ class PurePursuit:
             return 0.0
         xg, yg = gp
         curvature = (2 * yg) / (self.L_d**2)
-        return v * curvature
\ No newline at end of file
+        return v * curvature
+
+    def update_batch(self, v, paths, L_d=None):
+        # v (B,), paths (B, M, 2) in each robot's frame, optional per-path L_d (B,)
+        paths = np.asarray(paths, dtype=float)
+        L_d = np.broadcast_to(np.asarray(self.L_d if L_d is None else L_d, dtype=float), paths.shape[:1])
+        if paths.shape[1] == 0:
+            # no path points: no goal, zero turn rate as in update()
+            return np.zeros(paths.shape[0])
+        if paths.shape[1] == 1:
+            goal = paths[:, 0, :]
+        else:
+            i, t, valid, d = _circle_crossing(paths, L_d)
+            p0 = np.take_along_axis(paths[:, :-1, :], i[:, None, None], axis=1)[:, 0, :]
+            p1 = np.take_along_axis(paths[:, 1:, :], i[:, None, None], axis=1)[:, 0, :]
+            crossing = p0 + t[:, None] * (p1 - p0)
+            j = np.argmin(np.abs(d - L_d[:, None]), axis=1)
+            nearest = np.take_along_axis(paths, j[:, None, None], axis=1)[:, 0, :]
+            goal = np.where(valid[:, None], crossing, nearest)
+        curvature = 2.0 * goal[:, 1] / L_d ** 2
+        return np.asarray(v, dtype=float) * curvature
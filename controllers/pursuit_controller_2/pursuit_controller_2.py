@@ -1,9 +1,23 @@
+import os
+import sys
+# shared code outside this directory (Webots only puts the controller
+# directory on the path): perception/ as a package from the repo root,
+# particle_filter/resampling.py by bare name
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "particle_filter")]
+
 from controller import Supervisor
 from pioneer_controller import PioneerController
 from pid_controller import PIDController
 from pure_pursuit import PurePursuit
 from pf_state_estimator import PFEstimator
+from kalman_estimator import EKFEstimator, HybridEstimator
+from pursuit_loop import PursuitLoop
+from breadcrumbs import BreadcrumbPath
+from trajectory_log import TrajectoryLogWriter
+from profiling import TickProfiler
 import math
+import time
 import numpy as np
 
 # config
@@ -13,14 +27,17 @@ HORIZON_STEPS = 40
 TARGET_DISTANCE = 1.0
 LOOKAHEAD_DISTANCE = 1.0
 VMAX = 1.2
+LOG_PATH = os.environ.get("PURSUIT_LOG")  # binary trajectory log, see trajectory_log.py
+CAMERA_NAME = os.environ.get("PURSUIT_CAMERA")  # camera device; unset = supervisor measurement
+ESTIMATOR = os.environ.get("PURSUIT_ESTIMATOR", "pf")  # pf, ekf or hybrid, see kalman_estimator.py
+# steer along the teacher's past positions (breadcrumbs.py); 0 = extrapolated trajectory
+BREADCRUMBS = os.environ.get("PURSUIT_BREADCRUMBS", "1") != "0"
 
 
-def normalize_angle(a):
-    while a > math.pi:
-        a -= 2 * math.pi
-    while a < -math.pi:
-        a += 2 * math.pi
-    return a
+def read_pose(node):
+    pos = node.getPosition()
+    orn = node.getOrientation()
+    return (pos[0], pos[1], math.atan2(orn[3], orn[0]))
 
 
 robot = Supervisor()
@@ -36,46 +53,64 @@ if teacher_node is None:
 
 pid_speed = PIDController(Kp=0.5, Ki=0.01, Kd=0.1, target=TARGET_DISTANCE, output_min=0.0, output_max=VMAX)
 pp_steer = PurePursuit(L_d=LOOKAHEAD_DISTANCE)
-pf_estimator = PFEstimator(N=200)
-
-pos = student_node.getPosition()
-orn = student_node.getOrientation()
-yaw = math.atan2(orn[3], orn[0])
-last_student_pose = np.array([pos[0], pos[1], yaw])
+# PURSUIT_PROFILE=1: per-stage tick timings and deadline misses, printed at the end
+profiler = TickProfiler.from_env(budget=timestep / 1000.0)
+if ESTIMATOR == "ekf":
+    pf_estimator = EKFEstimator(profiler=profiler)
+elif ESTIMATOR == "hybrid":
+    pf_estimator = HybridEstimator(N=200, profiler=profiler)
+else:
+    pf_estimator = PFEstimator(N=200, profiler=profiler)
+
+loop = PursuitLoop(pf_estimator, pid_speed, pp_steer, horizon_steps=HORIZON_STEPS, vision_noise_std=VISION_NOISE_STD,
+                   dt=timestep / 1000.0, profiler=profiler,
+                   breadcrumbs=BreadcrumbPath() if BREADCRUMBS else None)
+loop.reset(read_pose(student_node))
+
+pipeline = None
+if CAMERA_NAME:
+    # camera -> MarkerDetector -> MeasurementModel on a worker thread, see perception_pipeline.py
+    from perception.detector import MarkerDetector
+    from perception.measurement import MeasurementModel
+    from perception_pipeline import PerceptionPipeline
+    camera = robot.getDevice(CAMERA_NAME)
+    camera.enable(timestep)
+    cfg_path = os.path.join(REPO_ROOT, "perception", "marker_config.yaml")
+    detector = MarkerDetector(cfg_path, track=True, cached_bounds=True)
+    model = MeasurementModel(cfg_path)
+    pipeline = PerceptionPipeline(detector.detect, lambda t, b: model.from_blob(t, b.u, b.v, b.area, b.visible),
+                                  max_age=4 * timestep / 1000.0)
+
+log = None
+if LOG_PATH:
+    log = TrajectoryLogWriter(LOG_PATH, meta={"timestep_ms": timestep, "teacher": TEACHER_DEF_NAME})
 
 while robot.step(timestep) != -1:
-    current_pos = student_node.getPosition()
-    current_orn = student_node.getOrientation()
-    current_yaw = math.atan2(current_orn[3], current_orn[0])
-
-    student_pose = np.array([current_pos[0], current_pos[1], current_yaw])
-    teacher_pos = teacher_node.getPosition()
-
-    dx = student_pose[0] - last_student_pose[0]
-    dy = student_pose[1] - last_student_pose[1]
-    dd_local = math.hypot(dx, dy)
-    dtheta_local = normalize_angle(current_yaw - last_student_pose[2])
-
-    heading = np.array([math.cos(last_student_pose[2]), math.sin(last_student_pose[2])])
-    disp = np.array([dx, dy])
-    if np.dot(heading, disp) < 0:
-        dd_local = -dd_local
-
-    dxg = teacher_pos[0] - current_pos[0]
-    dyg = teacher_pos[1] - current_pos[1]
-    cos_y = math.cos(current_yaw)
-    sin_y = math.sin(current_yaw)
-    x_local = dxg * cos_y + dyg * sin_y
-    y_local = -dxg * sin_y + dyg * cos_y
-
-    measured_x = x_local + np.random.normal(0.0, VISION_NOISE_STD)
-    measured_y = y_local + np.random.normal(0.0, VISION_NOISE_STD)
-
-    est_x, est_y, est_theta, path = pf_estimator.update_state(dd_local, dtheta_local, measured_x, measured_y, horizon_steps=HORIZON_STEPS)
-
-    dist = math.hypot(est_x, est_y)
-    v_desired = pid_speed.update(dist)
-    w_desired = pp_steer.update(v_desired, path)
-
-    controller.set_robot_velocity(v_desired, w_desired)
-    last_student_pose = student_pose
\ No newline at end of file
+    with profiler.tick():
+        with profiler.section("pose_read"):
+            student_pose = read_pose(student_node)
+            teacher_pos = teacher_node.getPosition()
+        obs = None
+        if pipeline is not None:
+            with profiler.section("camera"):
+                frame = np.frombuffer(camera.getImage(), np.uint8).reshape(camera.getHeight(), camera.getWidth(), 4)
+                pipeline.submit(robot.getTime(), np.ascontiguousarray(frame[:, :, :3]))
+                obs = pipeline.latest()
+            tick_start = time.monotonic()
+            v_desired, w_desired = loop.step_obs(student_pose, obs)
+            pipeline.record("control", time.monotonic() - tick_start)
+        else:
+            v_desired, w_desired = loop.step(student_pose, teacher_pos)
+        with profiler.section("actuate"):
+            controller.set_robot_velocity(v_desired, w_desired)
+        if log is not None:
+            with profiler.section("log"):
+                log.append_tick(robot.getTime(), student_pose, teacher_pos, loop, obs)
+
+if log is not None:
+    log.close()
+if pipeline is not None:
+    pipeline.close()
+    print(pipeline.summary())
+if profiler.enabled:
+    print(profiler.report())
@@ -0,0 +1,112 @@
+import math
+import numpy as np
+from profiling import NULL_PROFILER
+
+
+def normalize_angle(a):
+    while a > math.pi:
+        a -= 2 * math.pi
+    while a < -math.pi:
+        a += 2 * math.pi
+    return a
+
+
+def student_motion(last_pose, pose):
+    # signed distance travelled along the previous heading, and heading change
+    dx = pose[0] - last_pose[0]
+    dy = pose[1] - last_pose[1]
+    dd_local = math.hypot(dx, dy)
+    dtheta_local = normalize_angle(pose[2] - last_pose[2])
+    if dx * math.cos(last_pose[2]) + dy * math.sin(last_pose[2]) < 0:
+        dd_local = -dd_local
+    return dd_local, dtheta_local
+
+
+def to_student_frame(pose, point):
+    dxg = point[0] - pose[0]
+    dyg = point[1] - pose[1]
+    cos_y = math.cos(pose[2])
+    sin_y = math.sin(pose[2])
+    return dxg * cos_y + dyg * sin_y, -dxg * sin_y + dyg * cos_y
+
+
+class PursuitLoop:
+    # One control tick of pursuit_controller_2: student ego-motion and a noisy
+    # teacher measurement in, PF estimate -> PID speed + pure-pursuit steering out.
+    # Shared by the Webots controller and the headless replay so both run the same code.
+    def __init__(self, pf_estimator, pid_speed, pp_steer, horizon_steps=40,
+                 vision_noise_std=0.10, rng=None, dt=None, profiler=None, breadcrumbs=None):
+        self.pf_estimator = pf_estimator
+        self.pid_speed = pid_speed
+        self.pp_steer = pp_steer
+        self.horizon_steps = horizon_steps
+        self.vision_noise_std = vision_noise_std
+        self.rng = np.random.default_rng() if rng is None else rng
+        # fixed control period (s) handed to the PID; None lets it read its clock
+        self.dt = dt
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+        # BreadcrumbPath: steer along the teacher's past positions instead of
+        # the estimator's extrapolated trajectory once it holds two points
+        self.breadcrumbs = breadcrumbs
+        self.last_student_pose = None
+        # last tick, kept for logging / analysis
+        self.measured = (0.0, 0.0)
+        self.est = (0.0, 0.0, 0.0)
+        self.path = []
+        self.v_desired = 0.0
+        self.w_desired = 0.0
+
+    def reset(self, student_pose):
+        self.last_student_pose = np.array(student_pose[:3], dtype=float)
+        if self.breadcrumbs is not None:
+            self.breadcrumbs.clear()
+
+    def step(self, student_pose, teacher_pos):
+        student_pose = np.array(student_pose[:3], dtype=float)
+        if self.last_student_pose is None:
+            self.last_student_pose = student_pose
+        dd_local, dtheta_local = student_motion(self.last_student_pose, student_pose)
+
+        x_local, y_local = to_student_frame(student_pose, teacher_pos)
+        measured_x = x_local + self.rng.normal(0.0, self.vision_noise_std)
+        measured_y = y_local + self.rng.normal(0.0, self.vision_noise_std)
+
+        out = self.pf_estimator.update_state(dd_local, dtheta_local, measured_x, measured_y,
+                                             horizon_steps=self.horizon_steps)
+        self.measured = (measured_x, measured_y)
+        return self._control(student_pose, out, dd_local, dtheta_local)
+
+    def step_obs(self, student_pose, obs):
+        # camera-driven tick: obs is a PerceptionObs (bearing/range in the
+        # student frame), or None / invisible for a predict-only tick
+        student_pose = np.array(student_pose[:3], dtype=float)
+        if self.last_student_pose is None:
+            self.last_student_pose = student_pose
+        dd_local, dtheta_local = student_motion(self.last_student_pose, student_pose)
+        out = self.pf_estimator.update_state_obs(dd_local, dtheta_local, obs, horizon_steps=self.horizon_steps)
+        if obs is not None and obs.visible and obs.range_m is not None:
+            self.measured = (obs.range_m * math.cos(obs.bearing_rad), obs.range_m * math.sin(obs.bearing_rad))
+        else:
+            self.measured = (math.nan, math.nan)
+        return self._control(student_pose, out, dd_local, dtheta_local)
+
+    def _control(self, student_pose, out, dd_local, dtheta_local):
+        est_x, est_y, est_theta, path = out[:4]
+        if self.breadcrumbs is not None:
+            with self.profiler.section('breadcrumbs'):
+                crumbs = self.breadcrumbs.update(dd_local, dtheta_local, est_x, est_y)
+            if crumbs.shape[0] >= 2:
+                path = crumbs
+
+        dist = math.hypot(est_x, est_y)
+        with self.profiler.section('pid'):
+            v_desired = self.pid_speed.update(dist, dt=self.dt)
+        with self.profiler.section('pure_pursuit'):
+            w_desired = self.pp_steer.update(v_desired, path)
+
+        self.est = (est_x, est_y, est_theta)
+        self.path = path
+        self.v_desired = v_desired
+        self.w_desired = w_desired
+        self.last_student_pose = student_pose
+        return v_desired, w_desired
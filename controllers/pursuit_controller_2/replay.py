@@ -0,0 +1,195 @@
+import argparse
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+# resampling.py lives in particle_filter/, see pursuit_controller_2.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "particle_filter"))
+from pid_controller import PIDController
+from pure_pursuit import PurePursuit
+from pf_state_estimator import PFEstimator
+from pursuit_loop import PursuitLoop, to_student_frame
+from profiling import TickProfiler
+from kalman_estimator import EKFEstimator, HybridEstimator
+from breadcrumbs import BreadcrumbPath
+
+# Headless replay of the pursuit_controller_2 loop: no Webots, simulated time.
+# Defaults mirror the constants in pursuit_controller_2.py.
+
+DT = 0.032
+VISION_NOISE_STD = 0.10
+HORIZON_STEPS = 40
+TARGET_DISTANCE = 1.0
+LOOKAHEAD_DISTANCE = 1.0
+VMAX = 1.2
+
+ESTIMATORS = {'pf': PFEstimator, 'ekf': EKFEstimator, 'hybrid': HybridEstimator}
+
+
+class FakeClock:
+    def __init__(self, start=0.0):
+        self.t = float(start)
+
+    def __call__(self):
+        return self.t
+
+    def advance(self, dt):
+        self.t += dt
+
+
+@dataclass
+class ReplayResult:
+    ticks: int
+    wall_time: float
+    ticks_per_sec: float
+    est_rmse: float       # PF estimate vs true teacher position, student frame (m)
+    gap_rmse: float       # true student-teacher distance vs TARGET_DISTANCE (m)
+    est_error: np.ndarray # (T,)
+    v: np.ndarray         # (T,)
+    w: np.ndarray         # (T,)
+
+
+def synthetic_episode(steps=1000, dt=DT, kind='s_curve', speed=0.5, gap=TARGET_DISTANCE, seed=None):
+    # teacher drives a path at constant speed; the student replays the same path
+    # `gap` metres behind. Returns student poses (T, 3) and teacher positions (T, 2).
+    rng = np.random.default_rng(seed)
+    s = speed * dt * np.arange(steps) + gap
+    if kind == 'straight':
+        curvature = np.zeros_like(s)
+    elif kind == 'arc':
+        curvature = np.full_like(s, 0.5)
+    elif kind == 's_curve':
+        curvature = 0.6 * np.sin(s / 2.0 + rng.uniform(0, 2 * math.pi))
+    else:
+        raise ValueError(f"unknown episode kind '{kind}'")
+
+    # integrate heading and position along arc length on a fine grid, then sample
+    grid = np.linspace(0.0, s[-1], max(4 * steps, 2))
+    k_grid = np.interp(grid, s, curvature)
+    ds = np.diff(grid, prepend=0.0)
+    th = np.cumsum(k_grid * ds)
+    x = np.cumsum(np.cos(th) * ds)
+    y = np.cumsum(np.sin(th) * ds)
+
+    def at(arc):
+        return np.stack((np.interp(arc, grid, x), np.interp(arc, grid, y), np.interp(arc, grid, th)), axis=1)
+
+    teacher = at(s)
+    student = at(s - gap)
+    return student, teacher[:, :2]
+
+
+def default_loop(clock, seed=None, pf_kwargs=None, pid_gains=(0.5, 0.01, 0.1), lookahead=LOOKAHEAD_DISTANCE,
+                 target_distance=TARGET_DISTANCE, horizon_steps=HORIZON_STEPS, vision_noise_std=VISION_NOISE_STD,
+                 profiler=None, estimator='pf', breadcrumbs=False):
+    rng = np.random.default_rng(seed)
+    kp, ki, kd = pid_gains
+    pid_speed = PIDController(Kp=kp, Ki=ki, Kd=kd, target=target_distance, output_min=0.0, output_max=VMAX,
+                              clock=clock)
+    pp_steer = PurePursuit(L_d=lookahead)
+    pf_kwargs = dict({'N': 200}, **(pf_kwargs or {}))
+    pf_kwargs.setdefault('seed', rng.integers(2**63))
+    # estimator: 'pf', 'ekf' or 'hybrid' (see kalman_estimator.py)
+    if estimator == 'ekf':
+        pf_kwargs.pop('N')
+        pf_kwargs.pop('seed')
+    pf_estimator = ESTIMATORS[estimator](profiler=profiler, **pf_kwargs)
+    return PursuitLoop(pf_estimator, pid_speed, pp_steer, horizon_steps=horizon_steps,
+                       vision_noise_std=vision_noise_std, rng=rng, profiler=profiler,
+                       breadcrumbs=BreadcrumbPath() if breadcrumbs else None)
+
+
+def replay_episode(student_poses, teacher_positions, dt=DT, loop=None, clock=None, seed=None,
+                   closed_loop=False, on_tick=None):
+    # open loop: the recorded student poses are fed as-is (estimator regression).
+    # closed loop: only the first student pose is used and the student is
+    # integrated as a unicycle from the commanded (v, w) (controller evaluation).
+    student_poses = np.asarray(student_poses, dtype=float)
+    teacher_positions = np.asarray(teacher_positions, dtype=float)
+    if clock is None:
+        clock = FakeClock()
+    if loop is None:
+        loop = default_loop(clock, seed=seed)
+    T = teacher_positions.shape[0]
+
+    est_error = np.empty(T)
+    gap = np.empty(T)
+    v_out = np.empty(T)
+    w_out = np.empty(T)
+
+    pose = student_poses[0, :3].copy()
+    loop.reset(pose)
+    t0 = time.perf_counter()
+    for k in range(T):
+        clock.advance(dt)
+        if not closed_loop:
+            pose = student_poses[k, :3]
+        teacher = teacher_positions[k]
+        with loop.profiler.tick():
+            v, w = loop.step(pose, teacher)
+
+        tx, ty = to_student_frame(pose, teacher)
+        est_error[k] = math.hypot(loop.est[0] - tx, loop.est[1] - ty)
+        gap[k] = math.hypot(tx, ty)
+        v_out[k] = v
+        w_out[k] = w
+        if on_tick is not None:
+            on_tick(k, pose, teacher, loop)
+
+        if closed_loop:
+            pose = pose.copy()
+            pose[0] += v * math.cos(pose[2]) * dt
+            pose[1] += v * math.sin(pose[2]) * dt
+            pose[2] = math.atan2(math.sin(pose[2] + w * dt), math.cos(pose[2] + w * dt))
+    wall = time.perf_counter() - t0
+
+    target = loop.pid_speed.target
+    return ReplayResult(
+        ticks=T,
+        wall_time=wall,
+        ticks_per_sec=T / wall if wall > 0 else float('inf'),
+        est_rmse=float(np.sqrt(np.mean(est_error ** 2))),
+        gap_rmse=float(np.sqrt(np.mean((gap - target) ** 2))),
+        est_error=est_error,
+        v=v_out,
+        w=w_out,
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="headless replay of the pursuit_controller_2 loop")
+    ap.add_argument("--episodes", type=int, default=10)
+    ap.add_argument("--steps", type=int, default=1000)
+    ap.add_argument("--kind", default="s_curve", choices=["straight", "arc", "s_curve"])
+    ap.add_argument("--closed-loop", action="store_true")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--estimator", default="pf", choices=sorted(ESTIMATORS))
+    ap.add_argument("--breadcrumbs", action="store_true", help="steer along the teacher's past positions")
+    ap.add_argument("--profile", action="store_true", help="per-stage tick timings, as PURSUIT_PROFILE=1")
+    args = ap.parse_args()
+
+    seeds = np.random.SeedSequence(args.seed).spawn(args.episodes)
+    profiler = TickProfiler(enabled=args.profile, budget=DT)
+    results = []
+    for ss in seeds:
+        student, teacher = synthetic_episode(args.steps, kind=args.kind, seed=ss)
+        clock = FakeClock()
+        loop = default_loop(clock, seed=ss, profiler=profiler, estimator=args.estimator,
+                            breadcrumbs=args.breadcrumbs)
+        results.append(replay_episode(student, teacher, loop=loop, clock=clock, closed_loop=args.closed_loop))
+    ticks = sum(r.ticks for r in results)
+    wall = sum(r.wall_time for r in results)
+    print(f"episodes={len(results)} ticks={ticks} ticks/s={ticks / wall:.0f} "
+          f"realtime_x={ticks * DT / wall:.1f} "
+          f"est_rmse={np.mean([r.est_rmse for r in results]):.3f} "
+          f"gap_rmse={np.mean([r.gap_rmse for r in results]):.3f}")
+    if profiler.enabled:
+        print(profiler.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import math
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+import numpy as np
+from pf_state_estimator import PFEstimator
+
+# PFEstimator for particle counts that do not fit a tick on one core. The
+# particles (two (3, N) buffers, resampling gathers from one into the other)
+# and the log weights live in one shared memory block; worker k owns columns
+# [lo_k, hi_k) of it. One tick is two or three round trips over per-worker
+# pipes, each carrying only a few scalars:
+#
+#   update    predict and add the log-likelihood on the slice     -> slice max
+#   weigh     w = exp(lw - global max) on the slice               -> sum w, sum w^2, sum w * particle
+#   resample  systematic resampling: one global offset u0; the
+#             draws landing in worker k's share of the total
+#             weight are those j with P_k <= (j + u0) S / N < P_k+1,
+#             gathered from its own slice into [j_lo, j_hi) of the
+#             other buffer                                         -> done
+#
+# so the weight reduction is K partial sums and no particle crosses a pipe.
+
+
+def _views(buf, N):
+    particles = np.ndarray((2, 3, N), dtype=np.float64, buffer=buf)
+    log_weights = np.ndarray((N,), dtype=np.float64, buffer=buf, offset=particles.nbytes)
+    return particles, log_weights
+
+
+def _shard_draws(w, p_lo, p_hi, total, N, u0):
+    # systematic draws j whose point (j + u0) * total / N lies in this shard's
+    # [p_lo, p_hi) of the cumulative weight -> (j_lo, j_hi, indices into w).
+    # Adjacent shards evaluate their shared boundary identically, so the
+    # ranges tile [0, N).
+    j_lo = min(max(math.ceil(p_lo * N / total - u0), 0), N)
+    j_hi = min(max(math.ceil(p_hi * N / total - u0), 0), N)
+    if j_hi <= j_lo:
+        return j_lo, j_lo, np.empty(0, dtype=np.intp)
+    cdf = np.cumsum(w)
+    cdf += p_lo
+    points = (np.arange(j_lo, j_hi) + u0) * (total / N)
+    idx = np.minimum(np.searchsorted(cdf, points, side='right'), w.shape[0] - 1)
+    return j_lo, j_hi, idx
+
+
+def _worker(name, N, lo, hi, process_std, measurement_std, seed, conn):
+    # attaching registers the block again with the parent's resource tracker,
+    # a no-op; the parent unlinks it in close()
+    shm = shared_memory.SharedMemory(name=name)
+    particles, log_weights = _views(shm.buf, N)
+    rng = np.random.default_rng(seed)
+    lw = log_weights[lo:hi]
+    w = np.empty(hi - lo)
+    try:
+        while True:
+            msg = conn.recv()
+            cmd = msg[0]
+            if cmd == 'update':
+                _, cur, dd, dtheta, measured_x, measured_y = msg
+                x, y, th = particles[cur][:, lo:hi]
+                dd_noisy = dd + rng.normal(scale=process_std[0], size=hi - lo)
+                dtheta_noisy = dtheta + rng.normal(scale=process_std[1], size=hi - lo)
+                x -= dd_noisy
+                c, s = np.cos(dtheta_noisy), np.sin(dtheta_noisy)
+                x_prev = x.copy()
+                x *= c
+                x += y * s
+                y *= c
+                y -= x_prev * s
+                th -= dtheta_noisy
+                th += math.pi
+                np.remainder(th, 2 * math.pi, out=th)
+                th -= math.pi
+                sq = np.square(x - measured_x)
+                sq += np.square(y - measured_y)
+                lw -= (0.5 / measurement_std ** 2) * sq
+                conn.send(float(lw.max()) if hi > lo else -math.inf)
+            elif cmd == 'weigh':
+                _, cur, m = msg
+                lw -= m
+                np.exp(lw, out=w)
+                conn.send((float(w.sum()), float(w @ w), particles[cur][:, lo:hi] @ w))
+            elif cmd == 'resample':
+                _, cur, p_lo, p_hi, total, u0 = msg
+                j_lo, j_hi, idx = _shard_draws(w, p_lo, p_hi, total, N, u0)
+                particles[1 - cur][:, j_lo:j_hi] = particles[cur][:, lo:hi][:, idx]
+                lw.fill(0.0)
+                conn.send(None)
+            elif cmd == 'close':
+                break
+    finally:
+        del particles, log_weights, lw
+        shm.close()
+
+
+class ShardedPFEstimator:
+    def __init__(self, N=1000000, workers=None, process_std=[0.05, 0.05], measurement_std=0.5, seed=None):
+        self._N = int(N)
+        self.workers = int(workers or os.cpu_count() or 1)
+        seeds = np.random.SeedSequence(seed).spawn(self.workers + 1)
+        self.rng = np.random.default_rng(seeds[0])
+        self.est = np.array([0.0, 0.0, 0.0])
+        self.last_neff = float(self._N)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=7 * self._N * 8)
+        self._particles, self._log_weights = _views(self._shm.buf, self._N)
+        self._cur = 0
+        self._particles[0, :2] = self.rng.normal(scale=1.0, size=(2, self._N))
+        self._particles[0, 2] = self.rng.uniform(-math.pi, math.pi, self._N)
+        self._log_weights.fill(0.0)
+
+        bounds = np.linspace(0, self._N, self.workers + 1).astype(int)
+        self._conns = []
+        self._procs = []
+        for k in range(self.workers):
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, daemon=True,
+                              args=(self._shm.name, self._N, int(bounds[k]), int(bounds[k + 1]),
+                                    tuple(process_std), measurement_std, seeds[k + 1], child))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    @property
+    def N(self):
+        return self._N
+
+    @property
+    def particles(self):
+        return self._particles[self._cur]
+
+    @property
+    def weights(self):
+        w = np.exp(self._log_weights - self._log_weights.max())
+        return w / w.sum()
+
+    def _broadcast(self, msgs):
+        for conn, msg in zip(self._conns, msgs):
+            conn.send(msg)
+        return [conn.recv() for conn in self._conns]
+
+    def update_state(self, dd, dtheta, measured_x, measured_y, horizon_steps=40):
+        K, cur = self.workers, self._cur
+        m = max(self._broadcast([('update', cur, dd, dtheta, measured_x, measured_y)] * K))
+        parts = self._broadcast([('weigh', cur, m)] * K)
+        sums = np.array([p[0] for p in parts])
+        total = sums.sum()
+        self.est = np.sum([p[2] for p in parts], axis=0) / total
+        self.last_neff = total ** 2 / sum(p[1] for p in parts)
+        if self.last_neff < self._N / 2.0:
+            prefix = np.concatenate(([0.0], np.cumsum(sums)))
+            prefix[-1] = total
+            u0 = float(self.rng.random())
+            self._broadcast([('resample', cur, float(prefix[k]), float(prefix[k + 1]), float(total), u0)
+                             for k in range(K)])
+            self._cur = 1 - cur
+        est_x, est_y, est_theta = self.est
+        trajectory = PFEstimator._rollout(est_x, est_y, est_theta, 0.0, horizon_steps)
+        return est_x, est_y, est_theta, trajectory
+
+    def close(self):
+        if self._shm is None:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(('close',))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        del self._particles, self._log_weights
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
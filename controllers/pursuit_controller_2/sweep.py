@@ -0,0 +1,119 @@
+import argparse
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from replay import FakeClock, default_loop, replay_episode, synthetic_episode, DT, HORIZON_STEPS, \
+    LOOKAHEAD_DISTANCE, TARGET_DISTANCE
+
+# Parameter sweep over the closed-loop replay: every configuration runs the
+# same synthetic teacher episodes in a worker process with its own seeded
+# filter/sensor RNG, and the per-configuration metrics go into one table.
+
+DEFAULTS = {
+    'kp': 0.5, 'ki': 0.01, 'kd': 0.1,
+    'lookahead': LOOKAHEAD_DISTANCE,
+    'target_distance': TARGET_DISTANCE,
+    'horizon_steps': HORIZON_STEPS,
+    'process_std_d': 0.05, 'process_std_theta': 0.05,
+    'measurement_std': 0.5,
+    'N': 200,
+}
+
+METRICS = ('gap_rmse', 'est_rmse', 'effort', 'us_per_tick')
+
+
+def make_grid(**values):
+    # make_grid(kp=[0.3, 0.5], lookahead=[0.8, 1.0]) -> list of full configs
+    names = list(values)
+    grid = []
+    for combo in itertools.product(*(values[n] for n in names)):
+        config = dict(DEFAULTS)
+        config.update(zip(names, combo))
+        grid.append(config)
+    return grid
+
+
+def run_config(config, seed, episodes=5, steps=1000, episode_seed=0, kinds=('straight', 'arc', 's_curve')):
+    # seed (int or SeedSequence) drives this configuration's filter and sensor
+    # noise; episode_seed fixes the teacher trajectories, so every
+    # configuration of a sweep sees the same episodes. Episode k is kinds[k % len(kinds)].
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    loop_seeds = seed.spawn(episodes)
+    episode_seeds = np.random.SeedSequence(episode_seed).spawn(episodes)
+    rows = []
+    for k in range(episodes):
+        student, teacher = synthetic_episode(steps, kind=kinds[k % len(kinds)],
+                                             gap=config['target_distance'], seed=episode_seeds[k])
+        clock = FakeClock()
+        loop = default_loop(
+            clock, seed=loop_seeds[k],
+            pf_kwargs={'N': int(config['N']),
+                       'process_std': [config['process_std_d'], config['process_std_theta']],
+                       'measurement_std': config['measurement_std']},
+            pid_gains=(config['kp'], config['ki'], config['kd']),
+            lookahead=config['lookahead'],
+            target_distance=config['target_distance'],
+            horizon_steps=int(config['horizon_steps']))
+        r = replay_episode(student, teacher, dt=DT, loop=loop, clock=clock, closed_loop=True)
+        effort = float(np.mean(r.v ** 2 + r.w ** 2))
+        rows.append((r.gap_rmse, r.est_rmse, effort, 1e6 * r.wall_time / r.ticks))
+    result = dict(config)
+    result.update(zip(METRICS, np.mean(rows, axis=0).tolist()))
+    return result
+
+
+def run_sweep(grid, episodes=5, steps=1000, seed=0, workers=None):
+    seeds = np.random.SeedSequence(seed).spawn(len(grid))
+    if workers == 1:
+        return [run_config(c, s, episodes, steps, seed) for c, s in zip(grid, seeds)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_config, c, s, episodes, steps, seed) for c, s in zip(grid, seeds)]
+        return [f.result() for f in futures]
+
+
+def write_table(results, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(DEFAULTS) + list(METRICS))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _parse_grid(items):
+    values = {}
+    for item in items:
+        name, _, vals = item.partition('=')
+        if name not in DEFAULTS:
+            raise SystemExit(f"unknown parameter '{name}', expected one of {', '.join(DEFAULTS)}")
+        values[name] = [float(v) for v in vals.split(',')]
+    return values
+
+
+def main():
+    ap = argparse.ArgumentParser(description="parallel parameter sweep over the headless pursuit loop")
+    ap.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                    help=f"parameter values to sweep, one of: {', '.join(DEFAULTS)}")
+    ap.add_argument("--episodes", type=int, default=5)
+    ap.add_argument("--steps", type=int, default=1000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="sweep.csv")
+    args = ap.parse_args()
+
+    grid = make_grid(**_parse_grid(args.grid))
+    results = run_sweep(grid, episodes=args.episodes, steps=args.steps, seed=args.seed, workers=args.workers)
+    write_table(results, args.out)
+    results.sort(key=lambda r: r['gap_rmse'])
+    print(f"{len(results)} configurations -> {args.out}")
+    for r in results[:10]:
+        changed = {k: r[k] for k in DEFAULTS if r[k] != DEFAULTS[k]}
+        print(f"gap_rmse={r['gap_rmse']:.3f} est_rmse={r['est_rmse']:.3f} effort={r['effort']:.3f} "
+              f"us/tick={r['us_per_tick']:.0f} {changed}")
+
+
+if __name__ == '__main__':
+    main()
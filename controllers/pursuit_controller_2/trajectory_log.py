@@ -0,0 +1,137 @@
+import json
+import os
+import struct
+import numpy as np
+
+# Append-only binary trajectory log.
+#
+#   [magic 8B][version u4][header_len u4][JSON header, space padded to 64B]
+#   [record][record]...  fixed-size little-endian records of RECORD_DTYPE
+#
+# The writer fills a preallocated block of records and writes it in one call
+# when full, so a tick costs a few field assignments. Records have a fixed size,
+# so a log cut short by a crash is still readable up to the last full record.
+# The reader np.memmaps the records; every column is a zero-copy strided view.
+
+MAGIC = b'PTLOG\x00\x00\x01'
+VERSION = 1
+_ALIGN = 64
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('student_x', '<f8'), ('student_y', '<f8'), ('student_yaw', '<f8'),
+    ('teacher_x', '<f8'), ('teacher_y', '<f8'),
+    ('measured_x', '<f8'), ('measured_y', '<f8'),
+    ('est_x', '<f8'), ('est_y', '<f8'), ('est_theta', '<f8'),
+    ('v_desired', '<f8'), ('w_desired', '<f8'),
+    ('n_particles', '<i4'),
+    # PerceptionObs; NaN when no observation was made this tick
+    ('obs_t', '<f8'), ('obs_bearing', '<f8'), ('obs_range', '<f8'),
+    ('obs_bearing_var', '<f8'), ('obs_range_var', '<f8'), ('obs_visible', 'u1'),
+])
+
+
+def _empty_block(rows, dtype):
+    block = np.zeros(rows, dtype=dtype)
+    for name in dtype.names:
+        if dtype[name].kind == 'f':
+            block[name] = np.nan
+    return block
+
+
+class TrajectoryLogWriter:
+    def __init__(self, path, meta=None, block_rows=1024, dtype=RECORD_DTYPE):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._template = _empty_block(block_rows, self.dtype)
+        self._block = self._template.copy()
+        self._n = 0
+        self.count = 0
+        header = json.dumps({'dtype': self.dtype.descr, 'meta': meta or {}}).encode()
+        pad = (-(len(MAGIC) + 8 + len(header))) % _ALIGN
+        header += b' ' * pad
+        self._f = open(path, 'wb')
+        self._f.write(MAGIC + struct.pack('<II', VERSION, len(header)) + header)
+
+    def append(self, **fields):
+        rec = self._block[self._n]
+        for name, value in fields.items():
+            rec[name] = value
+        self._n += 1
+        self.count += 1
+        if self._n == self._block.shape[0]:
+            self.flush()
+
+    def append_tick(self, t, student_pose, teacher_pos, loop, obs=None):
+        # one PursuitLoop tick; loop.est / measured / v_desired / w_desired are
+        # what the loop produced on its last step()
+        rec = self._block[self._n]
+        rec['t'] = t
+        rec['student_x'], rec['student_y'], rec['student_yaw'] = student_pose[0], student_pose[1], student_pose[2]
+        rec['teacher_x'], rec['teacher_y'] = teacher_pos[0], teacher_pos[1]
+        rec['measured_x'], rec['measured_y'] = loop.measured
+        rec['est_x'], rec['est_y'], rec['est_theta'] = loop.est
+        rec['v_desired'] = loop.v_desired
+        rec['w_desired'] = loop.w_desired
+        rec['n_particles'] = getattr(loop.pf_estimator, 'N', 0)
+        if obs is not None:
+            rec['obs_t'] = obs.t
+            rec['obs_bearing'] = obs.bearing_rad
+            rec['obs_range'] = np.nan if obs.range_m is None else obs.range_m
+            rec['obs_bearing_var'] = obs.bearing_var
+            rec['obs_range_var'] = np.nan if obs.range_var is None else obs.range_var
+            rec['obs_visible'] = obs.visible
+        self._n += 1
+        self.count += 1
+        if self._n == self._block.shape[0]:
+            self.flush()
+
+    def flush(self):
+        if self._n:
+            self._f.write(self._block[:self._n].tobytes())
+            np.copyto(self._block[:self._n], self._template[:self._n])
+            self._n = 0
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryLog:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: not a trajectory log")
+            version, header_len = struct.unpack('<II', f.read(8))
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported trajectory log version {version}")
+            header = json.loads(f.read(header_len).decode())
+        self.meta = header['meta']
+        self.dtype = np.dtype([tuple(field) for field in header['dtype']])
+        offset = len(MAGIC) + 8 + header_len
+        n = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if n > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(n,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    @property
+    def columns(self):
+        return self.dtype.names
+
+    def __len__(self):
+        return self.records.shape[0]
+
+    def __getitem__(self, key):
+        # column name -> (T,) view; int / slice / mask -> records
+        return self.records[key]
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
+import numpy as np
 
 @dataclass
 class PerceptionObs:
@@ -9,3 +10,78 @@ class PerceptionObs:
     bearing_var: float         # variance (rad^2)
     range_var: Optional[float] # variance (m^2) or None
     visible: bool              # marker currently seen
+
+# columnar form of PerceptionObs (one row per observation); range_m,
+# bearing_var and range_var are NaN where the scalar form has None / no data
+OBS_DTYPE = np.dtype([
+    ("t", np.float64),
+    ("bearing_rad", np.float64),
+    ("range_m", np.float64),
+    ("bearing_var", np.float64),
+    ("range_var", np.float64),
+    ("visible", np.bool_),
+])
+
+@dataclass
+class SlottedPerceptionObs:
+    # PerceptionObs without a per-instance __dict__, for long histories
+    __slots__ = ("t", "bearing_rad", "range_m", "bearing_var", "range_var", "visible")
+    t: float
+    bearing_rad: float
+    range_m: Optional[float]
+    bearing_var: float
+    range_var: Optional[float]
+    visible: bool
+
+
+class ObsRingBuffer:
+    # Bounded history of the last `capacity` records, one preallocated NumPy
+    # column per dtype field. Every record is written twice, at slot i and
+    # i + capacity, so the newest n rows are always one contiguous slice:
+    # append is O(1) and window()/column() return views, never copies.
+    def __init__(self, capacity, dtype=OBS_DTYPE):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._cols = {name: np.zeros(2 * self.capacity, dtype=self.dtype[name]) for name in self.dtype.names}
+        self._count = 0  # total records ever appended
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, obs=None, **fields):
+        # obs: any object with the dtype's field names as attributes
+        # (PerceptionObs, SlottedPerceptionObs, ...); None maps to NaN
+        i = self._count % self.capacity
+        for name, col in self._cols.items():
+            value = fields[name] if obs is None else getattr(obs, name)
+            if value is None:
+                value = np.nan
+            col[i] = value
+            col[i + self.capacity] = value
+        self._count += 1
+
+    def extend(self, records):
+        # records: structured array with this buffer's fields
+        records = records[-self.capacity:]
+        slots = (self._count + np.arange(records.shape[0])) % self.capacity
+        for name, col in self._cols.items():
+            col[slots] = records[name]
+            col[slots + self.capacity] = records[name]
+        self._count += records.shape[0]
+
+    def _bounds(self, last):
+        n = len(self) if last is None else min(int(last), len(self))
+        end = (self._count - 1) % self.capacity + self.capacity + 1 if self._count else 0
+        return end - n, end
+
+    def column(self, name, last=None):
+        start, end = self._bounds(last)
+        return self._cols[name][start:end]
+
+    def window(self, last=None):
+        # {field: view of the newest `last` values, oldest first}
+        start, end = self._bounds(last)
+        return {name: col[start:end] for name, col in self._cols.items()}
+
+    def clear(self):
+        self._count = 0
@@ -1,182 +1,183 @@
+import argparse
 import time
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import multivariate_normal
-
-def systematicResampling(weightArray):
-    # N is the total number of samples
-    N=len(weightArray)
-    # cummulative sum of weights
-    cValues=[]
-    cValues.append(weightArray[0])
-
-    for i in range(N-1):
-        cValues.append(cValues[i]+weightArray[i+1])
-
-    # starting random point
-    startingPoint=np.random.uniform(low=0.0, high=1/(N))
-    
-    # this list stores indices of resampled states
-    resampledIndex=[]
-    for j in range(N):
-        currentPoint=startingPoint+(1/N)*(j)
-        s=0
-        while (currentPoint>cValues[s]):
-            s=s+1
-            
-        resampledIndex.append(s)
-        print("Resampled index:", s)
-
-    return resampledIndex
-
-# define the statistics of the process disturbance
-meanProcess=np.array([0,0])
-covarianceProcess=np.array([[0.002, 0],[0, 0.002]])
-
-# define the statistics of the measurement noise
-meanNoise=np.array([0])
-covarianceNoise=np.array([[0.001]])
-
-# create distributions of the process disturbance and measurement noise
-processDistribution=multivariate_normal(mean=meanProcess,cov=covarianceProcess)
-noiseDistribution=multivariate_normal(mean=meanNoise,cov=covarianceNoise)
-
-# construct a state-space model
-# mass-spring damper system 
-
-# first construct a continuous-time system
-m=5
-ks=200
-kd=30
-
-Ac=np.array([[0,1],[-ks/m, -kd/m]])
-Cc=np.array([[1,0]])
-Bc=np.array([[0],[1/m]])
-
-# discretize the system 
-# discretization constant
-h=0.01
-
-A=np.linalg.inv(np.eye(2)-h*Ac)
-B=h*np.matmul(A,Bc)
-C=Cc
-
-# simulate the dynamics to get the state-space trajectory 
-simTime=1000
-
-# select the initial state for simulating the state trajectory and output
-x0=np.array([[0.1],[0.01]])
-
-stateDim,tmp11=x0.shape
-
-# control input
-#controlInput=10*np.random.rand(1,simTime)
-controlInput=100*np.ones((1,simTime))
-
-# this array is used to store the state trajectory
-stateTrajectory=np.zeros(shape=(stateDim,simTime+1))
-
-# this array is used to store the output trajectory
-output=np.zeros(shape=(1,simTime))
-
-# set the initial state
-stateTrajectory[:,[0]]=x0
-
-# simulate the state-space model
-for i in range(simTime):
-    stateTrajectory[:,[i+1]]=np.matmul(A,stateTrajectory[:,[i]])+np.matmul(B,controlInput[:,[i]])+processDistribution.rvs(size=1).reshape(stateDim,1)
-    output[:,[i]]=np.matmul(C,stateTrajectory[:,[i]])+noiseDistribution.rvs(size=1).reshape(1,1)
-
-# initial guess of the state 
-x0Guess=x0+np.array([[0.7],[-0.6]])
-pointsX, pointsY = np.mgrid[x0Guess[0,0]-0.8:x0Guess[0,0]+0.8:0.1, x0Guess[1,0]-0.5:x0Guess[1,0]+0.5:0.1]
-xVec=pointsX.reshape((-1, 1), order="C")
-yVec=pointsY.reshape((-1, 1), order="C")
-
-# initial set of states
-# states at initial points are stored column-wise
-states=np.hstack((xVec,yVec)).transpose()
-
-dim1,numberParticle=states.shape
-
-# initial set of weights
-# uniform set of weights
-weights=(1/numberParticle)*np.ones((1,numberParticle))
-
-# number of iterations of the particle filter
-numberIterations=100
-
-# list used to store the states and track convergence 
-stateList=[]
-stateList.append(states)
-# list used to store the weights and track convergence
-weightList=[]
-weightList.append(weights)
-
-# this is the main iteration of the particle filter algorithm 
-# k=1,2,3,...
-for i in range(numberIterations):
-    # STEP 1:
-    # here we sample states by using the state transition probability
-    # we apply the same input to every particle
-    controlInputBatch=controlInput[0,i]*np.ones((1,numberParticle))
-    # these are the states sampled from the transition probability 
-    newStates=np.matmul(A,states)+np.matmul(B,controlInputBatch)+processDistribution.rvs(size=numberParticle).transpose()
-    # create a vector for storing the weights
-   
-    # STEP 2: 
-    newWeights=np.zeros(shape=(1,numberParticle))
-    # here we update the weights
-    for j in range(numberParticle):
-        # create a normal distribution on the basis of the current particle state
-        meanDis=np.matmul(C,newStates[:,[j]])
-        distributionO=multivariate_normal(mean=meanDis[0],cov=covarianceNoise)
-        # update the weights
-        newWeights[:,j]=distributionO.pdf(output[:,i])*weights[:,[j]]
-      
-    # standardize the weights 
-    weightsStandardized=newWeights/(newWeights.sum())
-    
-    
-    # STEP 3:
-    # calculate effective sample size - Neff
-    tmp1=[val**2 for val in weightsStandardized]
-    Neff=1/(np.array(tmp1).sum())
-    
-    # resample if this condition is met
-    if Neff<(numberParticle//3):
-        
-        # first resampling approach - resampling according to the probabilities stored in the weights
-        resampledStateIndex=np.random.choice(np.arange(numberParticle), numberParticle, p=weightsStandardized[0,:])
-        
-        # second resampling approach - systematic resampling
-        #resampledStateIndex=systematicResampling(weightsStandardized[0,:])
-        
-        newStates=newStates[:,resampledStateIndex]
-        weightsStandardized=(1/numberParticle)*np.ones((1,numberParticle))
-    
-    # for the next iteration
-    states=newStates
-    weights=weightsStandardized
-    
-    # memorize the states and weights
-    stateList.append(states)
-    weightList.append(weights)
-
-# let us compute the mean state trajectory
-meanStateSequence=np.zeros(shape=(stateDim,numberIterations))
-for i in range(numberIterations):
-    meanState=np.zeros(shape=(stateDim,1))
-    for j in range(numberParticle):
-        meanState=meanState+weightList[i][:,j]*stateList[i][:,j].reshape(2,1)
-        
-    meanStateSequence[:,[i]]=meanState
-        
-# compute the estimation error 
-# however, we need to do a statistical error analysis test 
-# we cannot just compute the error norm
-errorSequence=np.zeros(shape=(stateDim,numberIterations))
-errorSequenceNorm=np.zeros(shape=(1,numberIterations))
-for i in range(numberIterations):
-    errorSequence[:,[i]]=meanStateSequence[:,[i]]-stateTrajectory[:,[i]]
-    errorSequenceNorm[:,i]=np.linalg.norm(errorSequence[:,i], 2)
\ No newline at end of file
+from resampling import get_scheme, systematic
+
+# Reference particle filter for linear-Gaussian state-space models
+#
+#   x[k+1] = A x[k] + B u[k] + w[k],   w ~ N(0, Q)
+#   y[k]   = C x[k] + v[k],            v ~ N(0, R)
+#
+# States are stored column-wise, (stateDim, N). The weight update evaluates
+# the Gaussian measurement likelihood of all particles at once in the log
+# domain, so importing this module needs only numpy; matplotlib is imported
+# by plot() when it is called. `python particle_filter.py` runs the
+# mass-spring-damper demo.
+
+
+def systematicResampling(weightArray, rng=None):
+    # one uniform offset, N evenly spaced points, located in the cumulative
+    # sum of the weights with a single searchsorted (see resampling.py)
+    return systematic(np.asarray(weightArray), rng=rng)
+
+
+def mass_spring_damper(m=5.0, ks=200.0, kd=30.0, h=0.01):
+    # continuous-time mass-spring-damper, discretized with backward Euler
+    Ac = np.array([[0, 1], [-ks / m, -kd / m]])
+    Bc = np.array([[0], [1 / m]])
+    Cc = np.array([[1, 0]])
+    A = np.linalg.inv(np.eye(2) - h * Ac)
+    B = h * A @ Bc
+    return A, B, Cc
+
+
+# noise statistics of the mass-spring-damper benchmark
+Q_DEFAULT = np.array([[0.002, 0], [0, 0.002]])
+R_DEFAULT = np.array([[0.001]])
+
+
+def simulate(A, B, C, Q, R, x0, u, rng=None):
+    # u (inputDim, T) -> states (stateDim, T+1), outputs (outputDim, T) with
+    # outputs[:, k] measuring states[:, k]
+    rng = np.random.default_rng(rng)
+    u = np.atleast_2d(u)
+    T = u.shape[1]
+    n, m = A.shape[0], C.shape[0]
+    w = np.linalg.cholesky(Q) @ rng.standard_normal((n, T))
+    v = np.linalg.cholesky(R) @ rng.standard_normal((m, T))
+    states = np.zeros((n, T + 1))
+    states[:, 0] = np.ravel(x0)
+    for k in range(T):
+        states[:, k + 1] = A @ states[:, k] + B @ u[:, k] + w[:, k]
+    outputs = C @ states[:, :T] + v
+    return states, outputs
+
+
+def grid_particles(center, half_width, spacing):
+    # particles on a regular grid around center, one column per particle
+    axes = [np.arange(c - hw, c + hw, spacing) for c, hw in zip(np.ravel(center), np.ravel(half_width))]
+    return np.stack([g.ravel() for g in np.meshgrid(*axes, indexing='ij')])
+
+
+class LinearGaussianPF:
+    def __init__(self, A, B, C, Q, R, particles, resampling='multinomial', resample_threshold=1 / 3,
+                 seed=None):
+        # particles: initial states (stateDim, N), equally weighted. Resamples
+        # when Neff drops below resample_threshold * N.
+        self.A = np.asarray(A, dtype=float)
+        self.B = np.asarray(B, dtype=float)
+        self.C = np.asarray(C, dtype=float)
+        self._Q_chol = np.linalg.cholesky(np.asarray(Q, dtype=float))
+        # log N(y; Cx, R) = -0.5 |L^-1 (y - Cx)|^2 + const, R = L L^T
+        self._R_inv_chol = np.linalg.inv(np.linalg.cholesky(np.asarray(R, dtype=float)))
+        self.particles = np.array(particles, dtype=float)
+        self.N = self.particles.shape[1]
+        self.weights = np.full(self.N, 1.0 / self.N)
+        self._resample_fn = get_scheme(resampling)
+        self.resample_threshold = resample_threshold
+        self.rng = np.random.default_rng(seed)
+        self.resample_count = 0
+
+    def predict(self, u):
+        # same input for every particle, independent process noise
+        u = np.asarray(u, dtype=float).reshape(-1, 1)
+        noise = self._Q_chol @ self.rng.standard_normal(self.particles.shape)
+        self.particles = self.A @ self.particles + self.B @ u + noise
+
+    def log_likelihood(self, y):
+        e = np.asarray(y, dtype=float).reshape(-1, 1) - self.C @ self.particles
+        z = self._R_inv_chol @ e
+        return -0.5 * np.einsum('ij,ij->j', z, z)
+
+    def update(self, y):
+        loglik = self.log_likelihood(y)
+        w = self.weights * np.exp(loglik - loglik.max())
+        self.weights = w / w.sum()
+        if self.neff() < self.resample_threshold * self.N:
+            self.resample()
+
+    def neff(self):
+        return 1.0 / np.dot(self.weights, self.weights)
+
+    def resample(self):
+        idx = self._resample_fn(self.weights, rng=self.rng)
+        self.particles = self.particles[:, idx]
+        self.weights.fill(1.0 / self.N)
+        self.resample_count += 1
+
+    def step(self, u, y):
+        # propagate with u[k-1], then weight with y[k]
+        self.predict(u)
+        self.update(y)
+        return self.mean()
+
+    def mean(self):
+        return self.particles @ self.weights
+
+    def run(self, u, y):
+        # filter a whole record: y (outputDim, T) measures x[0..T-1], u
+        # (inputDim, T) drives x[k] -> x[k+1]. Returns estimates (stateDim, T).
+        u = np.atleast_2d(u)
+        y = np.atleast_2d(y)
+        T = y.shape[1]
+        est = np.empty((self.particles.shape[0], T))
+        self.update(y[:, 0])
+        est[:, 0] = self.mean()
+        for k in range(1, T):
+            est[:, k] = self.step(u[:, k - 1], y[:, k])
+        return est
+
+
+def plot(states, estimates, path=None):
+    import matplotlib
+    if path is not None:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    T = estimates.shape[1]
+    fig, axes = plt.subplots(states.shape[0] + 1, 1, sharex=True, figsize=(8, 6))
+    for i in range(states.shape[0]):
+        axes[i].plot(states[i, :T], label='true')
+        axes[i].plot(estimates[i], '--', label='PF mean')
+        axes[i].set_ylabel(f'x{i + 1}')
+    axes[0].legend()
+    axes[-1].plot(np.linalg.norm(estimates - states[:, :T], axis=0))
+    axes[-1].set_ylabel('|error|')
+    axes[-1].set_xlabel('k')
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="particle filter on the mass-spring-damper benchmark")
+    ap.add_argument("--steps", type=int, default=1000)
+    ap.add_argument("--resampling", default="multinomial")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--plot", nargs="?", const="", default=None, metavar="PATH",
+                    help="plot the estimate (to PATH if given)")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    A, B, C = mass_spring_damper()
+    x0 = np.array([0.1, 0.01])
+    u = 100 * np.ones((1, args.steps))
+    states, outputs = simulate(A, B, C, Q_DEFAULT, R_DEFAULT, x0, u, rng=rng)
+
+    # initial guess off the true state, particles on a grid around it
+    guess = x0 + np.array([0.7, -0.6])
+    pf = LinearGaussianPF(A, B, C, Q_DEFAULT, R_DEFAULT, grid_particles(guess, [0.8, 0.5], 0.1),
+                          resampling=args.resampling, seed=rng)
+    start = time.perf_counter()
+    est = pf.run(u, outputs)
+    wall = time.perf_counter() - start
+    err = np.linalg.norm(est - states[:, :args.steps], axis=0)
+    tail = err[args.steps // 2:]
+    print(f"N={pf.N} steps={args.steps} iterations/s={args.steps / wall:.0f} "
+          f"resamples={pf.resample_count} rmse(second half)={np.sqrt(np.mean(tail ** 2)):.4f}")
+    if args.plot is not None:
+        plot(states, est, args.plot or None)
+
+
+if __name__ == '__main__':
+    main()
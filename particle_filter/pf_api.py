@@ -1,78 +1,314 @@
+import argparse
+import math
+import os
+import socket
 import sys
 import numpy as np
+from resampling import get_scheme
 
-# module-level state
+# Position-only particle filter. Each PFSession is an independent filter; the
+# module-level functions (init_particles, update_position, ...) drive a
+# default session, as the module globals did before.
+#
+# Streaming mode (`python pf_api.py --stream` or `--socket PATH`) keeps
+# filters alive across measurements. Input is either text lines "x y" or
+# "session x y", answered by "est_x est_y" / "session est_x est_y" lines, or
+# with --binary little-endian FRAME_DTYPE records answered by records of the
+# same layout. Whatever has arrived is processed as one micro-batch and its
+# estimates are written back with one write.
+
+FRAME_DTYPE = np.dtype([('session', '<u4'), ('x', '<f8'), ('y', '<f8')])
+
+
+class PFSession:
+    def __init__(self, N=200, process_std_xy=0.05, process_std_bearing=0.1, measurement_std=0.5,
+                 step_distance=0.1, resampling='multinomial', seed=None, log_weights=False):
+        self.particles = None  # shape (3, N)
+        self.weights = None    # shape (N,)
+        self.log_weights = None  # shape (N,), only in log-weight mode
+        self.N = int(N)
+        self.process_std_xy = process_std_xy
+        self.process_std_bearing = process_std_bearing
+        self.measurement_std = measurement_std
+        self.step_distance = step_distance
+        self.rng = np.random.default_rng(seed)
+        get_scheme(resampling)
+        self.resampling = resampling
+        self.use_log_weights = bool(log_weights)
+
+    def init_particles(self, N=None, center_x=0.0, center_y=0.0, center_bearing=None, spread=1.0,
+                       resampling=None, seed=None, log_weights=None):
+        if resampling is not None:
+            get_scheme(resampling)
+            self.resampling = resampling
+        if log_weights is not None:
+            self.use_log_weights = bool(log_weights)
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if N is not None:
+            self.N = int(N)
+        N = self.N
+        pos = self.rng.normal(loc=0.0, scale=spread, size=(2, N))
+        pos[0, :] += center_x
+        pos[1, :] += center_y
+
+        if center_bearing is None:
+            bearing = self.rng.uniform(-np.pi, np.pi, size=N)
+        else:
+            bearing = self.rng.normal(loc=center_bearing, scale=0.5, size=N)
+
+        self.particles = np.vstack((pos, bearing.reshape(1, -1)))
+        self.weights = np.ones((N,)) / N
+        self.log_weights = np.full(N, -np.log(N)) if self.use_log_weights else None
+        # per-particle process noise scale for one rng.normal call per update
+        self._noise_std = np.array([[self.process_std_xy], [self.process_std_xy], [self.process_std_bearing]])
+
+    def reset_particles(self, center_x=None, center_y=None, center_bearing=None, spread=1.0):
+        cx = 0.0 if center_x is None else float(center_x)
+        cy = 0.0 if center_y is None else float(center_y)
+        cb = None if center_bearing is None else float(center_bearing)
+        self.init_particles(center_x=cx, center_y=cy, center_bearing=cb, spread=spread)
+
+    def _resample(self):
+        indices = get_scheme(self.resampling)(self.weights, rng=self.rng)
+        self.particles = self.particles[:, indices]
+        self.weights.fill(1.0 / self.N)
+        if self.log_weights is not None:
+            self.log_weights.fill(-np.log(self.N))
+
+    def _neff(self):
+        if self.log_weights is None:
+            return 1.0 / np.dot(self.weights, self.weights)
+        # 1 / sum(exp(2 * lw)) as a log-sum-exp over the normalized log weights
+        lw = self.log_weights
+        m = np.max(lw)
+        return float(np.exp(-(2.0 * m + np.log(np.sum(np.exp(2.0 * (lw - m)))))))
+
+    def update_position(self, x, y):
+        if self.particles is None:
+            self.init_particles()
+        p = self.particles
+
+        # Predict: move along bearing + noise
+        dx = self.step_distance * np.cos(p[2, :])
+        dy = self.step_distance * np.sin(p[2, :])
+        p += self.rng.normal(size=p.shape) * self._noise_std
+        p[0, :] += dx
+        p[1, :] += dy
+        # wrap bearings to [-pi, pi]
+        p[2, :] = ((p[2, :] + np.pi) % (2 * np.pi)) - np.pi
+
+        # Update: weight by position likelihood only
+        dx = p[0, :] - x
+        dy = p[1, :] - y
+        sq = dx * dx + dy * dy
+        if self.log_weights is not None:
+            # log-sum-exp normalization: no pdf constant, no floor, no underflow
+            lw = self.log_weights
+            lw += -0.5 * sq / (self.measurement_std ** 2)
+            lw -= np.max(lw)
+            np.exp(lw, out=self.weights)
+            total = np.sum(self.weights)
+            self.weights /= total
+            lw -= np.log(total)
+        else:
+            coeff = 1.0 / (self.measurement_std * np.sqrt(2 * np.pi))
+            un = coeff * np.exp(-0.5 * sq / (self.measurement_std ** 2)) + 1e-12
+            self.weights *= un
+            self.weights /= np.sum(self.weights)
+
+        # Estimate position
+        est_x, est_y = p[0:2, :] @ self.weights
+
+        # Resample if needed
+        if self._neff() < (self.N / 2.0):
+            self._resample()
+
+        return float(est_x), float(est_y)
+
+    def update_batch(self, xy):
+        # consecutive measurements (M, 2) -> estimates after each (M, 2)
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        out = np.empty_like(xy)
+        for i, (x, y) in enumerate(xy.tolist()):
+            out[i] = self.update_position(x, y)
+        return out
+
+
+# module-level state: the old globals remain the source of truth for the
+# default session behind the module-level API. Each call loads them into the
+# session and stores its state back, so `pf_api._N = 50;
+# pf_api.reset_particles()` still configures the filter.
 _particles = None  # shape (3, N)
 _weights = None    # shape (N,)
+_log_weights = None  # shape (N,), only in log-weight mode
 _N = 200
 _process_std_xy = 0.05
 _process_std_bearing = 0.1
 _measurement_std = 0.5
 _step_distance = 0.1
+_resampling = 'multinomial'
+_use_log_weights = False
+_rng = np.random.default_rng()
 
+_default = PFSession()
+_SESSION_ATTRS = {'_particles': 'particles', '_weights': 'weights', '_log_weights': 'log_weights',
+                  '_N': 'N', '_rng': 'rng', '_resampling': 'resampling', '_use_log_weights': 'use_log_weights',
+                  '_process_std_xy': 'process_std_xy', '_process_std_bearing': 'process_std_bearing',
+                  '_measurement_std': 'measurement_std', '_step_distance': 'step_distance'}
 
-def init_particles(N=_N, center_x=0.0, center_y=0.0, center_bearing=None, spread=1.0):
-    global _particles, _weights, _N
-    _N = int(N)
-    pos = np.random.normal(loc=0.0, scale=spread, size=(2, _N))
-    pos[0, :] += center_x
-    pos[1, :] += center_y
 
-    if center_bearing is None:
-        bearing = np.random.uniform(-np.pi, np.pi, size=_N)
-    else:
-        bearing = np.random.normal(loc=center_bearing, scale=0.5, size=_N)
+def _call_default(method, *args):
+    g = globals()
+    for name, attr in _SESSION_ATTRS.items():
+        setattr(_default, attr, g[name])
+    try:
+        return getattr(_default, method)(*args)
+    finally:
+        for name, attr in _SESSION_ATTRS.items():
+            g[name] = getattr(_default, attr)
+
 
-    _particles = np.vstack((pos, bearing.reshape(1, -1)))
-    _weights = np.ones((_N,)) / _N
+def init_particles(N=None, center_x=0.0, center_y=0.0, center_bearing=None, spread=1.0,
+                   resampling=None, seed=None, log_weights=None):
+    _call_default('init_particles', N, center_x, center_y, center_bearing, spread, resampling, seed, log_weights)
 
 
 def reset_particles(center_x=None, center_y=None, center_bearing=None, spread=1.0):
-    cx = 0.0 if center_x is None else float(center_x)
-    cy = 0.0 if center_y is None else float(center_y)
-    cb = None if center_bearing is None else float(center_bearing)
-    init_particles(N=_N, center_x=cx, center_y=cy, center_bearing=cb, spread=spread)
+    _call_default('reset_particles', center_x, center_y, center_bearing, spread)
 
 
 def _resample():
-    global _particles, _weights
-    indices = np.random.choice(_N, size=_N, p=_weights)
-    _particles = _particles[:, indices]
-    _weights.fill(1.0 / _N)
+    _call_default('_resample')
+
+
+def _neff():
+    return _call_default('_neff')
 
 
 def update_position(x, y):
-    global _particles, _weights
-    if _particles is None:
-        init_particles()
-
-    # Predict: move along bearing + noise
-    bearings = _particles[2, :]
-    dx = _step_distance * np.cos(bearings)
-    dy = _step_distance * np.sin(bearings)
-    _particles[0, :] += dx + np.random.normal(scale=_process_std_xy, size=_N)
-    _particles[1, :] += dy + np.random.normal(scale=_process_std_xy, size=_N)
-    _particles[2, :] += np.random.normal(scale=_process_std_bearing, size=_N)
-    # wrap bearings to [-pi, pi]
-    _particles[2, :] = ((_particles[2, :] + np.pi) % (2 * np.pi)) - np.pi
-
-    # Update: weight by position likelihood only
-    diffs = _particles[0:2, :] - np.array([[x], [y]])
-    sq = np.sum(diffs * diffs, axis=0)
-    coeff = 1.0 / (_measurement_std * np.sqrt(2 * np.pi))
-    un = coeff * np.exp(-0.5 * sq / (_measurement_std ** 2)) + 1e-12
-    _weights *= un
-    _weights /= np.sum(_weights)
-
-    # Estimate position
-    est = np.average(_particles[0:2, :], axis=1, weights=_weights)
-
-    # Resample if needed
-    neff = 1.0 / np.sum(_weights ** 2)
-    if neff < (_N / 2.0):
-        _resample()
-
-    return float(est[0]), float(est[1])
+    return _call_default('update_position', x, y)
+
+
+class SessionPool:
+    # filters by session id, created on first use; session k is seeded from
+    # (seed, k) so a replayed stream gives the same estimates
+    def __init__(self, seed=None, **session_kwargs):
+        self.seed = seed
+        self.session_kwargs = session_kwargs
+        self.sessions = {}
+
+    def get(self, sid):
+        s = self.sessions.get(sid)
+        if s is None:
+            seed = None if self.seed is None else [self.seed, sid]
+            s = self.sessions[sid] = PFSession(seed=seed, **self.session_kwargs)
+        return s
+
+    def process_text(self, lines):
+        out = []
+        for line in lines:
+            fields = line.split()
+            try:
+                if len(fields) == 2:
+                    sid, x, y = None, float(fields[0]), float(fields[1])
+                elif len(fields) == 3:
+                    sid, x, y = int(fields[0]), float(fields[1]), float(fields[2])
+                    if sid < 0:
+                        raise ValueError
+                else:
+                    raise ValueError
+                if not (math.isfinite(x) and math.isfinite(y)):
+                    raise ValueError  # nan/inf would poison the session
+            except ValueError:
+                if fields:
+                    print(f"could not parse {line.strip()!r}", file=sys.stderr)
+                    out.append("nan nan")
+                continue
+            est_x, est_y = self.get(0 if sid is None else sid).update_position(x, y)
+            out.append(f"{est_x:.6f} {est_y:.6f}" if sid is None else f"{sid} {est_x:.6f} {est_y:.6f}")
+        return out
+
+    def process_frames(self, frames):
+        out = np.empty_like(frames)
+        out['session'] = frames['session']
+        # non-finite measurements are answered with nan and leave the session
+        # untouched, like unparsable text lines
+        out['x'] = np.nan
+        out['y'] = np.nan
+        rows = frames.tolist()
+        for i in np.flatnonzero(np.isfinite(frames['x']) & np.isfinite(frames['y'])).tolist():
+            sid, x, y = rows[i]
+            out['x'][i], out['y'][i] = self.get(sid).update_position(x, y)
+        return out
+
+
+def stream(read, write, pool, binary=False, chunk=1 << 16):
+    # read(n) -> bytes (b'' at end of input), write(bytes). Every read is one
+    # micro-batch; a frame split across reads waits for its remainder.
+    pending = b''
+    size = FRAME_DTYPE.itemsize
+    while True:
+        data = read(chunk)
+        if not data:
+            break
+        pending += data
+        if binary:
+            n = len(pending) // size
+            if n == 0:
+                continue
+            frames = np.frombuffer(pending[:n * size], dtype=FRAME_DTYPE)
+            pending = pending[n * size:]
+            write(pool.process_frames(frames).tobytes())
+        else:
+            cut = pending.rfind(b'\n') + 1
+            if cut == 0:
+                continue
+            # invalid UTF-8 turns into U+FFFD and fails to parse, line by line
+            lines = pending[:cut].decode(errors='replace').splitlines()
+            pending = pending[cut:]
+            out = pool.process_text(lines)
+            if out:
+                write(("\n".join(out) + "\n").encode())
+    if pending.strip() and not binary:
+        out = pool.process_text([pending.decode(errors='replace')])
+        if out:
+            write(("\n".join(out) + "\n").encode())
+
+
+def serve_stdio(pool, binary=False):
+    fd_in, out = sys.stdin.fileno(), sys.stdout.buffer
+
+    def write(b):
+        out.write(b)
+        out.flush()
+    stream(lambda n: os.read(fd_in, n), write, pool, binary)
+
+
+def _serve_client(conn, pool, binary=False):
+    try:
+        stream(conn.recv, conn.sendall, pool, binary)
+    except (BrokenPipeError, ConnectionResetError):
+        # client went away mid-stream; its sessions stay in the pool
+        print("client disconnected", file=sys.stderr)
+
+
+def serve_socket(path, pool, binary=False):
+    # Unix domain socket; clients are served one at a time and share the
+    # session pool, so filters outlive the connection that created them
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                _serve_client(conn, pool, binary)
+    finally:
+        server.close()
+        os.unlink(path)
 
 
 def main():
@@ -86,10 +322,29 @@ def main():
         est_x, est_y = update_position(x, y)
         print(f"meas=({x:.3f},{y:.3f}) -> est=({est_x:.4f},{est_y:.4f})")
 
-    if len(sys.argv) == 3:
+    if len(sys.argv) == 3 and not sys.argv[1].startswith('--'):
         process_pair(sys.argv[1], sys.argv[2])
         return
 
+    ap = argparse.ArgumentParser(description="position particle filter; one measurement pair from argv, "
+                                             "or a stream of them with --stream / --socket")
+    ap.add_argument("--stream", action="store_true", help="read measurements from stdin")
+    ap.add_argument("--socket", metavar="PATH", help="serve measurements on a Unix domain socket")
+    ap.add_argument("--binary", action="store_true", help="FRAME_DTYPE records instead of text lines")
+    ap.add_argument("--N", type=int, default=200)
+    ap.add_argument("--resampling", default="multinomial")
+    ap.add_argument("--log-weights", action="store_true")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    pool = SessionPool(seed=args.seed, N=args.N, resampling=args.resampling, log_weights=args.log_weights)
+    if args.socket:
+        serve_socket(args.socket, pool, args.binary)
+    elif args.stream:
+        serve_stdio(pool, args.binary)
+    else:
+        ap.print_usage(sys.stderr)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+
+# Vectorized resampling schemes shared by pf_api, particle_filter.py and the
+# pursuit_controller_2 estimators, whose entry points add this directory to
+# sys.path.
+#
+# Every scheme takes normalized weights of shape (N,) or (K, N) (one filter
+# per row) and returns int indices of shape (n,) or (K, n), n defaulting to N.
+#
+# For (N,) weights, out= (intp, (n,)) receives the indices and work= (float64,
+# (2, >= max(N, n))) holds the cumulative sum and the draw points, so a caller
+# with preallocated buffers resamples without N-sized temporaries (residual
+# still allocates internally and only copies into out).
+
+_CHUNK = 4096
+
+
+def _search(cdf, u, out=None):
+    # first index whose cdf exceeds u, row by row; rows are shifted by their
+    # row number so one searchsorted over the flattened arrays does all of them.
+    # cdf is always a fresh cumulative sum, so it is normalized in place.
+    cdf /= cdf[..., -1:].copy()
+    N = cdf.shape[-1]
+    if out is not None:
+        # searchsorted has no out=, so write chunk by chunk
+        for k in range(0, u.shape[0], _CHUNK):
+            o = out[k:k + _CHUNK]
+            o[...] = np.searchsorted(cdf, u[k:k + _CHUNK], side='right')
+            np.minimum(o, N - 1, out=o)
+        return out
+    if cdf.ndim == 1:
+        idx = np.searchsorted(cdf, u, side='right')
+        return np.minimum(idx, N - 1, out=idx)
+    K = cdf.shape[0]
+    offsets = np.arange(K).reshape(K, 1)
+    flat = np.searchsorted((cdf + offsets).ravel(), (u + offsets).ravel(), side='right')
+    idx = flat.reshape(u.shape) - offsets * N
+    return np.clip(idx, 0, N - 1, out=idx)
+
+
+def _draw_shape(weights, n):
+    n = weights.shape[-1] if n is None else int(n)
+    return weights.shape[:-1] + (n,), n
+
+
+def _cdf(weights, work):
+    return np.cumsum(weights, axis=-1) if work is None else np.cumsum(weights, out=work[0, :weights.shape[0]])
+
+
+def _add_arange(u):
+    # u[j] += j, with chunk-sized temporaries only
+    for k in range(0, u.shape[0], _CHUNK):
+        u[k:k + _CHUNK] += np.arange(k, min(k + _CHUNK, u.shape[0]))
+    return u
+
+
+def multinomial(weights, rng=None, n=None, out=None, work=None):
+    rng = np.random.default_rng() if rng is None else rng
+    weights = np.asarray(weights, dtype=float)
+    shape, n = _draw_shape(weights, n)
+    u = rng.random(shape) if work is None else rng.random(out=work[1, :n])
+    return _search(_cdf(weights, work), u, out)
+
+
+def stratified(weights, rng=None, n=None, out=None, work=None):
+    rng = np.random.default_rng() if rng is None else rng
+    weights = np.asarray(weights, dtype=float)
+    shape, n = _draw_shape(weights, n)
+    if work is None:
+        u = (np.arange(n) + rng.random(shape)) / n
+    else:
+        u = _add_arange(rng.random(out=work[1, :n]))
+        u /= n
+    return _search(_cdf(weights, work), u, out)
+
+
+def systematic(weights, rng=None, n=None, out=None, work=None):
+    rng = np.random.default_rng() if rng is None else rng
+    weights = np.asarray(weights, dtype=float)
+    shape, n = _draw_shape(weights, n)
+    start = rng.random(shape[:-1] + (1,))
+    if work is None:
+        u = (np.arange(n) + start) / n
+    else:
+        u = work[1, :n]
+        u.fill(start[0])
+        _add_arange(u)
+        u /= n
+    return _search(_cdf(weights, work), u, out)
+
+
+def residual(weights, rng=None, n=None, out=None, work=None):
+    rng = np.random.default_rng() if rng is None else rng
+    weights = np.asarray(weights, dtype=float)
+    shape, n = _draw_shape(weights, n)
+    w2 = np.atleast_2d(weights)
+    K, N = w2.shape
+    w2 = w2 / w2.sum(axis=1, keepdims=True)
+
+    # deterministic copies: floor(n * w) of every particle
+    scaled = n * w2
+    counts = np.floor(scaled).astype(np.int64)
+    left = n - counts.sum(axis=1)
+
+    # the remaining left[k] slots of each row are drawn from the fractional parts
+    frac = scaled - counts
+    fsum = frac.sum(axis=1, keepdims=True)
+    frac = np.divide(frac, fsum, out=np.full_like(frac, 1.0 / N), where=fsum > 0)
+    drawn = _search(np.cumsum(frac, axis=1), rng.random((K, n)))
+
+    cols = np.arange(n)
+    fixed = np.repeat(np.tile(np.arange(N), K), counts.ravel())
+    idx = np.empty((K, n), dtype=np.int64)
+    is_fixed = cols < (n - left)[:, None]
+    idx[is_fixed] = fixed
+    idx[~is_fixed] = drawn[cols < left[:, None]]
+    if out is None:
+        return idx.reshape(shape)
+    out[...] = idx.reshape(shape)
+    return out
+
+
+SCHEMES = {
+    'multinomial': multinomial,
+    'stratified': stratified,
+    'systematic': systematic,
+    'residual': residual,
+}
+
+
+def get_scheme(name):
+    try:
+        return SCHEMES[name]
+    except KeyError:
+        raise ValueError(f"unknown resampling scheme '{name}', expected one of {sorted(SCHEMES)}")
+
+
+def resample(weights, scheme='systematic', rng=None, n=None):
+    return get_scheme(scheme)(weights, rng=rng, n=n)
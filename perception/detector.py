@@ -1,14 +1,48 @@
-import cv2, numpy as np, yaml
+import cv2, numpy as np, yaml, os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 @dataclass
 class Blob:
     u:int; v:int; area:int; visible:bool
 
+@dataclass
+class SlottedBlob:
+    # Blob without a per-instance __dict__, for long histories
+    __slots__ = ("u", "v", "area", "visible")
+    u:int; v:int; area:int; visible:bool
+
+# detect_batch result, one row per frame
+BLOB_DTYPE = np.dtype([("u", np.int32), ("v", np.int32), ("area", np.int32), ("visible", np.bool_)])
+
 class MarkerDetector:
-    def __init__(self, cfg_path="perception/marker_config.yaml"):
+    def __init__(self, cfg_path="perception/marker_config.yaml", track=False, cached_bounds=False):
         with open(cfg_path, "r") as f:
             self.cfg = yaml.safe_load(f)
+        # cached bounds: percentiles read off 256-bin histograms of a strided
+        # subsample, recomputed every hsv_refresh frames or when the V
+        # histogram moves by more than hsv_shift (L1 of normalized histograms)
+        self.cached_bounds = cached_bounds
+        self.hsv_stride = self.cfg.get("hsv_stride", 4)
+        self.hsv_refresh = self.cfg.get("hsv_refresh", 10)
+        self.hsv_shift = self.cfg.get("hsv_shift", 0.1)
+        self._cache = None      # (lo, hi, normalized V histogram)
+        self._cache_age = 0
+        # tracking mode: search a padded ROI around the last blob (or a
+        # predicted pixel position) with the HSV bounds of the last full-frame
+        # pass; fall back to the full frame when the marker is lost there, and
+        # run a full-frame pass every roi_refresh frames anyway so the bounds
+        # follow lighting drift while the marker stays tracked. With cached
+        # bounds the cache ages on ROI frames too and, when due, is refreshed
+        # from the strided subsample alone.
+        self.track = track
+        self.roi_pad = self.cfg.get("roi_pad", 40)
+        self.roi_refresh = self.cfg.get("roi_refresh", 30)
+        self._bounds = None     # (lo, hi) from the last full-frame detection
+        self._roi_frames = 0    # ROI detections since the last full-frame pass
+        self._last_uv = None
+        self._last_size = None  # (w, h) of the last blob's bounding box
+        self._pool = None; self._pool_workers = 0
 
     def _auto_hsv_bounds(self, hsv):
         h,s,v = cv2.split(hsv)
@@ -18,16 +52,133 @@ class MarkerDetector:
         hi = np.array([self.cfg["h_hi"], 255, min(255, vmax)], np.uint8)
         return lo, hi
 
-    def detect(self, bgr) -> Blob:
-        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
-        lo, hi = self._auto_hsv_bounds(hsv)
+    @staticmethod
+    def _hist_percentile(hist, p):
+        # lowest level holding the p-th percentile of the histogram's pixels
+        cdf = np.cumsum(hist)
+        return float(np.searchsorted(cdf, p / 100.0 * cdf[-1], side="left"))
+
+    def _v_hist(self, hsv, st=None):
+        st = self.hsv_stride if st is None else st
+        sub = np.ascontiguousarray(hsv[::st, ::st])
+        vh = cv2.calcHist([sub], [2], None, [256], [0, 256]).ravel()
+        return sub, vh / max(vh.sum(), 1.0)
+
+    def _hist_hsv_bounds(self, sub, vh):
+        sh = cv2.calcHist([sub], [1], None, [256], [0, 256]).ravel()
+        vmin = self._hist_percentile(vh, self.cfg["v_p_low"])
+        vmax = self._hist_percentile(vh, self.cfg["v_p_high"])
+        smin = self._hist_percentile(sh, self.cfg["s_p_low"])
+        lo = np.array([self.cfg["h_lo"], max(5, smin), max(5, vmin)], np.uint8)
+        hi = np.array([self.cfg["h_hi"], 255, min(255, vmax)], np.uint8)
+        return lo, hi
+
+    def _cached_hsv_bounds(self, hsv, st=None):
+        sub, vh = self._v_hist(hsv, st)
+        self._cache_age += 1
+        if self._cache is not None and self._cache_age < self.hsv_refresh \
+           and np.abs(vh - self._cache[2]).sum() <= self.hsv_shift:
+            return self._cache[0], self._cache[1]
+        lo, hi = self._hist_hsv_bounds(sub, vh)
+        self._cache = (lo, hi, vh); self._cache_age = 0
+        return lo, hi
+
+    def _largest_blob(self, hsv, lo, hi):
+        # -> (contour, area) of the largest blob above min_area, or None
         mask = cv2.inRange(hsv, lo, hi)
         mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8))
         mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5,5),np.uint8))
         cnts,_ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not cnts: return Blob(0,0,0,False)
+        if not cnts: return None
         c = max(cnts, key=cv2.contourArea)
         area = int(cv2.contourArea(c))
-        if area < self.cfg["min_area"]: return Blob(0,0,0,False)
-        M = cv2.moments(c); u = int(M["m10"]/M["m00"]); v = int(M["m01"]/M["m00"])
+        if area < self.cfg["min_area"]: return None
+        return c, area
+
+    def _remember(self, c, x0=0, y0=0):
+        M = cv2.moments(c); u = int(M["m10"]/M["m00"]) + x0; v = int(M["m01"]/M["m00"]) + y0
+        _,_,w,h = cv2.boundingRect(c)
+        self._last_uv = (u, v); self._last_size = (w, h)
+        return u, v
+
+    def _detect_roi(self, bgr, predicted_uv):
+        center = predicted_uv if predicted_uv is not None else self._last_uv
+        if center is None: return None
+        H, W = bgr.shape[:2]
+        bw, bh = self._last_size if self._last_size is not None else (0, 0)
+        hw, hh = bw // 2 + self.roi_pad, bh // 2 + self.roi_pad
+        x0, x1 = max(0, int(center[0]) - hw), min(W, int(center[0]) + hw + 1)
+        y0, y1 = max(0, int(center[1]) - hh), min(H, int(center[1]) + hh + 1)
+        if x1 - x0 < 3 or y1 - y0 < 3: return None
+        hsv = cv2.cvtColor(bgr[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        found = self._largest_blob(hsv, *self._bounds)
+        if found is None: return None
+        c, area = found
+        # blob cut by the ROI edge (not the frame edge): area and centroid are
+        # biased, let the full-frame pass measure it
+        bx, by, w, h = cv2.boundingRect(c)
+        if (bx == 0 and x0 > 0) or (by == 0 and y0 > 0) or \
+           (bx + w >= x1 - x0 and x1 < W) or (by + h >= y1 - y0 and y1 < H):
+            return None
+        u, v = self._remember(c, x0, y0)
         return Blob(u,v,area,True)
+
+    def _refresh_roi_bounds(self, bgr):
+        # tracking with cached bounds: one frame older, and when the cache is
+        # due, new bounds from the subsample (converting only those pixels)
+        if self._cache_age + 1 < self.hsv_refresh:
+            self._cache_age += 1
+            return
+        st = self.hsv_stride
+        sub = cv2.cvtColor(np.ascontiguousarray(bgr[::st, ::st]), cv2.COLOR_BGR2HSV)
+        self._bounds = self._cached_hsv_bounds(sub, 1)
+
+    def detect(self, bgr, predicted_uv=None) -> Blob:
+        if self.track and self._bounds is not None and self._roi_frames < self.roi_refresh:
+            if self.cached_bounds:
+                self._refresh_roi_bounds(bgr)
+            blob = self._detect_roi(bgr, predicted_uv)
+            if blob is not None:
+                self._roi_frames += 1
+                return blob
+        self._roi_frames = 0
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        lo, hi = self._cached_hsv_bounds(hsv) if self.cached_bounds else self._auto_hsv_bounds(hsv)
+        found = self._largest_blob(hsv, lo, hi)
+        if found is None:
+            self._last_uv = None; self._last_size = None
+            return Blob(0,0,0,False)
+        c, area = found
+        self._bounds = (lo, hi)
+        u, v = self._remember(c)
+        return Blob(u,v,area,True)
+
+    def _detect_frame(self, bgr, out):
+        # stateless full-frame detection for detect_batch: no ROI, no cache,
+        # so frames can run on any thread in any order
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        lo, hi = self._hist_hsv_bounds(*self._v_hist(hsv)) if self.cached_bounds else self._auto_hsv_bounds(hsv)
+        found = self._largest_blob(hsv, lo, hi)
+        if found is None:
+            out[...] = (0, 0, 0, False); return
+        c, area = found
+        M = cv2.moments(c)
+        out[...] = (int(M["m10"]/M["m00"]), int(M["m01"]/M["m00"]), area, True)
+
+    def detect_batch(self, frames, workers=None) -> np.ndarray:
+        # frames: (B, H, W, 3) uint8 or a list of BGR frames of any size.
+        # OpenCV releases the GIL, so frames are spread over a thread pool.
+        out = np.zeros(len(frames), dtype=BLOB_DTYPE)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(frames) == 1:
+            for i in range(len(frames)): self._detect_frame(frames[i], out[i:i+1])
+            return out
+        if self._pool is None or self._pool_workers != workers:
+            self.close()
+            self._pool = ThreadPoolExecutor(max_workers=workers); self._pool_workers = workers
+        list(self._pool.map(lambda i: self._detect_frame(frames[i], out[i:i+1]), range(len(frames))))
+        return out
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(); self._pool = None
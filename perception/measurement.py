@@ -1,5 +1,5 @@
 import numpy as np, yaml
-from messages.types import PerceptionObs
+from messages.types import PerceptionObs, OBS_DTYPE
 
 class MeasurementModel:
     def __init__(self, cfg_path="perception/marker_config.yaml"):
@@ -13,10 +13,28 @@ class MeasurementModel:
     def from_blob(self, t, u, v, area_px, visible) -> PerceptionObs:
         if not visible:
             return PerceptionObs(t, 0.0, None, 1e3, None, False)
-        bearing = np.arctan2((u - self.cx)/self.fx, 1.0)
+        bearing = np.arctan2((self.cx - u)/self.fx, 1.0)
         s_px = np.sqrt(max(area_px, 1))
         rng = max((self.fx * self.L) / s_px, 0.05)
         bearing_var = (self.pix_noise / self.fx)**2
         range_var = (self.pix_noise * self.fx * self.L / (s_px**2))**2
         return PerceptionObs(float(t), float(bearing), float(rng),
                              float(bearing_var), float(range_var), True)
+
+    def from_blobs(self, t, u, v, area_px, visible) -> np.ndarray:
+        # vectorized from_blob: equal-length arrays in, OBS_DTYPE array out
+        visible = np.asarray(visible, dtype=bool)
+        out = np.empty(visible.shape, dtype=OBS_DTYPE)
+        out["t"] = t
+        out["visible"] = visible
+        u = np.asarray(u, dtype=np.float64)
+        s_px = np.sqrt(np.maximum(np.asarray(area_px, dtype=np.float64), 1.0))
+        out["bearing_rad"] = np.where(visible, np.arctan2((self.cx - u)/self.fx, 1.0), 0.0)
+        out["range_m"] = np.where(visible, np.maximum((self.fx * self.L) / s_px, 0.05), np.nan)
+        out["bearing_var"] = np.where(visible, (self.pix_noise / self.fx)**2, np.nan)
+        out["range_var"] = np.where(visible, (self.pix_noise * self.fx * self.L / (s_px**2))**2, np.nan)
+        return out
+
+    def from_blob_array(self, t, blobs) -> np.ndarray:
+        # blobs: MarkerDetector.detect_batch output (BLOB_DTYPE)
+        return self.from_blobs(t, blobs["u"], blobs["v"], blobs["area"], blobs["visible"])
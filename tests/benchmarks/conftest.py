@@ -0,0 +1,54 @@
+import json, os
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+# Per-benchmark best-round times (seconds) in baselines.json. A benchmark fails
+# when its fastest round exceeds baseline * BENCH_TOLERANCE (default 2.0); the
+# minimum is compared rather than the mean because the mean follows whatever
+# else the machine is running. BENCH_GATE=0 only times the calls, for noisy
+# local machines. Baselines are machine specific: regenerate them on the CI
+# box with BENCH_UPDATE=1. Under --benchmark-disable every call runs once,
+# untimed.
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "2.0"))
+GATE = os.environ.get("BENCH_GATE", "1") != "0"
+UPDATE = os.environ.get("BENCH_UPDATE") == "1"
+
+_baselines = {}
+if os.path.exists(BASELINES):
+    with open(BASELINES) as f:
+        _baselines = json.load(f)
+_measured = {}
+
+
+@pytest.fixture
+def bench(benchmark, request):
+    # bench(fn, *args, rounds=..., setup=...) -> result of fn; runs it under
+    # pytest-benchmark and, unless BENCH_GATE=0, checks the best round against
+    # the stored baseline
+    key = f"{request.node.module.__name__}::{request.node.name}"
+
+    def run(fn, *args, rounds=20, warmup_rounds=2, setup=None):
+        if setup is None:
+            result = benchmark.pedantic(fn, args=args, rounds=rounds, warmup_rounds=warmup_rounds)
+        else:
+            result = benchmark.pedantic(fn, setup=setup, rounds=rounds, warmup_rounds=warmup_rounds)
+        if benchmark.stats is None:
+            # --benchmark-disable: nothing was timed
+            return result
+        best = benchmark.stats.stats.min
+        _measured[key] = best
+        if GATE and not UPDATE and key in _baselines and best > _baselines[key] * TOLERANCE:
+            pytest.fail(f"{key}: best {1e3 * best:.3f} ms exceeds baseline "
+                        f"{1e3 * _baselines[key]:.3f} ms x {TOLERANCE}")
+        return result
+    return run
+
+
+def pytest_sessionfinish(session):
+    if UPDATE and _measured:
+        _baselines.update(_measured)
+        with open(BASELINES, "w") as f:
+            json.dump(dict(sorted(_baselines.items())), f, indent=2)
+            f.write("\n")
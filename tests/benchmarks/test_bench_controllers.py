@@ -0,0 +1,10 @@
+import numpy as np
+import pytest
+from pure_pursuit import PurePursuit
+
+@pytest.mark.parametrize("points", [40, 5000])
+def test_pure_pursuit_update(bench, points):
+    pp = PurePursuit(L_d=1.0)
+    t = np.linspace(0.0, 4.0, points)
+    path = np.stack((t, 0.2 * np.sin(t)), axis=1)
+    bench(pp.update, 0.5, path, rounds=200)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import pf_api
+import resampling
+from pf_state_estimator import PFEstimator
+from replay import FakeClock, default_loop, replay_episode, synthetic_episode
+
+SIZES = [200, 2000, 20000, 200000]
+
+def _rounds(N):
+    return 50 if N <= 20000 else 10
+
+@pytest.mark.parametrize("N", SIZES)
+def test_pf_estimator_update_state(bench, N):
+    pf = PFEstimator(N=N, seed=0)
+    bench(pf.update_state, 0.02, 0.01, 1.0, 0.1, rounds=_rounds(N))
+
+@pytest.mark.parametrize("N", SIZES)
+def test_pf_estimator_update_state_workspace(bench, N):
+    pf = PFEstimator(N=N, seed=0, workspace=True, log_weights=True, resampling="systematic")
+    bench(pf.update_state, 0.02, 0.01, 1.0, 0.1, rounds=_rounds(N))
+
+@pytest.mark.parametrize("N", SIZES)
+def test_pf_api_update_position(bench, N):
+    pf_api.init_particles(N=N, seed=0, resampling="multinomial", log_weights=False)
+    bench(pf_api.update_position, 1.0, 0.5, rounds=_rounds(N))
+
+@pytest.mark.parametrize("scheme", sorted(resampling.SCHEMES))
+def test_resampling_100k(bench, scheme):
+    rng = np.random.default_rng(0)
+    w = rng.random(100000)
+    w /= w.sum()
+    bench(resampling.resample, w, scheme, rng, rounds=30)
+
+@pytest.mark.parametrize("adaptive", [False, True], ids=["fixed2000", "adaptive"])
+def test_pf_estimator_episode(bench, adaptive):
+    # s-curve replay at worst-case N = 2000; KLD-sampling settles near 300
+    students, teachers = synthetic_episode(steps=300, seed=0)
+
+    def setup():
+        clock = FakeClock()
+        loop = default_loop(clock, seed=1, pf_kwargs={'N': 2000, 'adaptive': adaptive})
+        return (students, teachers), {'loop': loop, 'clock': clock}
+    bench(replay_episode, setup=setup, rounds=5)
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+from perception.detector import MarkerDetector
+from perception.measurement import MeasurementModel
+
+def _marker_frame(W, H):
+    rng = np.random.default_rng(0)
+    g = np.linspace(30, 255, W, dtype=np.float32)[None, :].repeat(H, 0)
+    img = np.clip(g[..., None] + rng.normal(0, 4, (H, W, 3)), 0, 255).astype(np.uint8)
+    cv2.circle(img, (W // 3, H // 2), 15, (30, 30, 200), -1)
+    return img
+
+@pytest.mark.parametrize("size", [(640, 480), (1280, 720)], ids=["640x480", "1280x720"])
+@pytest.mark.parametrize("mode", ["full", "tracked"])
+def test_marker_detector_detect(bench, size, mode):
+    det = MarkerDetector(track=True, cached_bounds=True) if mode == "tracked" else MarkerDetector()
+    frame = _marker_frame(*size)
+    blob = bench(det.detect, frame, rounds=30)
+    assert blob.visible
+
+def test_measurement_from_blob(bench):
+    m = MeasurementModel()
+    bench(m.from_blob, 0.0, 350, 240, 400, True, rounds=200)
+
+def test_measurement_from_blobs_100k(bench):
+    m = MeasurementModel()
+    n = 100000
+    u = np.full(n, 350); area = np.full(n, 400)
+    bench(m.from_blobs, np.arange(n) / 30.0, u, u, area, area > 0, rounds=30)
@@ -0,0 +1,9 @@
+import os, sys
+
+# Webots controllers and the standalone particle filter import their sibling
+# modules by bare name, so put those directories on the path like Webots does.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for d in ("controllers/pursuit_controller_2", "particle_filter"):
+    p = os.path.join(ROOT, d)
+    if p not in sys.path:
+        sys.path.insert(0, p)
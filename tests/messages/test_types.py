@@ -0,0 +1,18 @@
+import numpy as np
+from messages.types import PerceptionObs, SlottedPerceptionObs, ObsRingBuffer, OBS_DTYPE
+
+def test_slotted_obs_has_no_dict():
+    obs = SlottedPerceptionObs(0.0, 0.1, None, 1e-4, None, True)
+    assert not hasattr(obs, "__dict__") and obs.bearing_rad == 0.1
+
+def test_ring_buffer_keeps_last_records_as_views():
+    buf = ObsRingBuffer(4)
+    for k in range(6):
+        buf.append(PerceptionObs(float(k), 0.0, None if k % 2 else 1.0 + k, 1e-4, None, True))
+    t = buf.column("t")
+    assert len(buf) == 4 and list(t) == [2.0, 3.0, 4.0, 5.0]
+    assert t.base is not None and list(buf.column("t", last=2)) == [4.0, 5.0]
+    assert np.isnan(buf.window()["range_m"][1]) and buf.window()["range_m"][2] == 5.0
+    recs = np.zeros(3, dtype=OBS_DTYPE); recs["t"] = [6.0, 7.0, 8.0]
+    buf.extend(recs)
+    assert list(buf.column("t")) == [5.0, 6.0, 7.0, 8.0]
@@ -0,0 +1,39 @@
+import os, subprocess, sys
+import numpy as np
+import particle_filter as pf_mod
+
+def test_import_does_not_pull_plotting():
+    # fresh interpreter, so other tests' imports do not count
+    code = "import particle_filter, sys; assert 'matplotlib' not in sys.modules and 'scipy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(pf_mod.__file__), check=True)
+
+def test_log_likelihood_matches_gaussian_density():
+    A, B, C = pf_mod.mass_spring_damper()
+    R = np.array([[0.004]])
+    pf = pf_mod.LinearGaussianPF(A, B, C, pf_mod.Q_DEFAULT, R, np.array([[0.1, 0.3, -0.2], [0.0, 1.0, 2.0]]))
+    ll = pf.log_likelihood([0.25])
+    expected = -0.5 * (0.25 - np.array([0.1, 0.3, -0.2])) ** 2 / 0.004
+    assert np.allclose(ll - ll[0], expected - expected[0])
+
+def test_mass_spring_damper_tracks_like_a_kalman_filter():
+    rng = np.random.default_rng(0)
+    A, B, C = pf_mod.mass_spring_damper()
+    Q, R = pf_mod.Q_DEFAULT, pf_mod.R_DEFAULT
+    T = 1000
+    u = 100 * np.ones((1, T))
+    x0 = np.array([0.1, 0.01])
+    states, outputs = pf_mod.simulate(A, B, C, Q, R, x0, u, rng=rng)
+    guess = x0 + np.array([0.7, -0.6])
+    pf = pf_mod.LinearGaussianPF(A, B, C, Q, R, pf_mod.grid_particles(guess, [0.8, 0.5], 0.1),
+                                 resampling="systematic", seed=1)
+    est = pf.run(u, outputs)
+    # Kalman filter from the same guess is the optimal reference
+    x, P, kf = guess, np.eye(2) * 0.25, np.empty((2, T))
+    for k in range(T):
+        if k:
+            x, P = A @ x + B @ u[:, k - 1], A @ P @ A.T + Q
+        K = P @ C.T @ np.linalg.inv(C @ P @ C.T + R)
+        x, P = x + K @ (outputs[:, k] - C @ x), (np.eye(2) - K @ C) @ P
+        kf[:, k] = x
+    rmse = lambda e: np.sqrt(np.mean(e[:, T // 2:] ** 2, axis=1))
+    assert np.all(rmse(est - states[:, :T]) < 1.2 * rmse(kf - states[:, :T]))
@@ -0,0 +1,76 @@
+import numpy as np
+import pf_api
+
+def test_log_weights_survive_far_measurement():
+    pf_api.init_particles(N=500, seed=0, log_weights=True)
+    est_x, _ = pf_api.update_position(30.0, 0.0)
+    assert est_x > 2.0 and np.isfinite(pf_api._weights).all()
+    pf_api.init_particles(N=500, seed=0, log_weights=False)
+    est_x, _ = pf_api.update_position(30.0, 0.0)
+    assert abs(est_x) < 0.5
+
+def test_sessions_are_independent():
+    a = pf_api.PFSession(N=300, seed=1)
+    b = pf_api.PFSession(N=300, seed=1)
+    pf_api.init_particles(N=100, seed=2)
+    for k in range(20):
+        est_a = a.update_position(0.1 * k, 1.0)
+        pf_api.update_position(-5.0, -5.0)
+    assert list(est_a) == b.update_batch([[0.1 * k, 1.0] for k in range(20)])[-1].tolist()
+    assert pf_api._N == 100 and a.N == 300
+
+def _run_stream(data, binary, chunk):
+    import io
+    src, out = io.BytesIO(data), []
+    pf_api.stream(src.read, out.append, pf_api.SessionPool(seed=0, N=200), binary=binary, chunk=chunk)
+    return b"".join(out)
+
+def test_stream_text_and_binary_agree():
+    rng = np.random.default_rng(0)
+    frames = np.zeros(200, dtype=pf_api.FRAME_DTYPE)
+    frames["session"] = np.arange(200) % 3
+    frames["x"], frames["y"] = rng.normal(size=(2, 200))
+    text = "".join(f"{s} {x!r} {y!r}\n" for s, x, y in frames.tolist()).encode()
+    lines = _run_stream(text, False, chunk=37).decode().splitlines()
+    est = np.frombuffer(_run_stream(frames.tobytes(), True, chunk=50), dtype=pf_api.FRAME_DTYPE)
+    assert len(lines) == 200 and (est["session"] == frames["session"]).all()
+    parsed = np.array([line.split() for line in lines], dtype=float)
+    assert np.allclose(parsed[:, 1:], np.stack((est["x"], est["y"]), axis=1), atol=1e-6)
+
+def test_bad_session_id_is_an_unparsable_line():
+    pool = pf_api.SessionPool(seed=0)
+    out = pool.process_text(["-1 1.0 2.0", "x 1.0 2.0", "2 1.0 2.0"])
+    assert out[:2] == ["nan nan", "nan nan"] and out[2].startswith("2 ")
+    assert list(pool.sessions) == [2]
+
+def test_old_globals_configure_default_session():
+    pf_api._N = 50
+    pf_api.reset_particles()
+    assert pf_api._particles.shape == (3, 50) and pf_api._default.N == 50
+    pf_api.init_particles(N=200)
+
+def test_non_finite_measurements_leave_session_untouched():
+    pool = pf_api.SessionPool(seed=0)
+    out = pool.process_text(["nan 0", "1 inf 0", "1.0 2.0"])
+    assert out[:2] == ["nan nan", "nan nan"] and list(pool.sessions) == [0]
+    assert np.isfinite([float(v) for v in out[2].split()]).all()
+    frames = np.zeros(2, dtype=pf_api.FRAME_DTYPE)
+    frames["session"] = 5
+    frames["x"] = [np.nan, 1.0]
+    est = pool.process_frames(frames)
+    assert np.isnan(est["x"][0]) and np.isfinite([est["x"][1], est["y"][1]]).all()
+
+def test_invalid_utf8_is_an_unparsable_line():
+    lines = _run_stream(b"1.0 2.0\n\xff\xfe 1\n1.0 2.0\n\xc3", False, chunk=7).decode().splitlines()
+    assert len(lines) == 4 and lines[1] == lines[3] == "nan nan"
+
+def test_client_disconnect_keeps_server_alive():
+    class Conn:
+        chunks = [b"3 1.0 2.0\n", b""]
+        def recv(self, n):
+            return self.chunks.pop(0)
+        def sendall(self, b):
+            raise BrokenPipeError
+    pool = pf_api.SessionPool(seed=0)
+    pf_api._serve_client(Conn(), pool)
+    assert list(pool.sessions) == [3]
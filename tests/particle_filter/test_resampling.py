@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+import resampling
+
+@pytest.mark.parametrize("scheme", sorted(resampling.SCHEMES))
+def test_scheme_follows_weights_and_seed(scheme):
+    w = np.array([0.0, 0.5, 0.0, 0.25, 0.25])
+    idx = resampling.resample(w, scheme, np.random.default_rng(1), n=4000)
+    assert idx.shape == (4000,) and not np.isin(idx, [0, 2]).any()
+    assert np.allclose(np.bincount(idx, minlength=5) / 4000, w, atol=0.03)
+    again = resampling.resample(w, scheme, np.random.default_rng(1), n=4000)
+    assert np.array_equal(idx, again)
+    rows = resampling.resample(np.stack((w, w[::-1])), scheme, np.random.default_rng(1))
+    assert rows.shape == (2, 5) and not np.isin(rows[1], [2, 4]).any()
+
+@pytest.mark.parametrize("scheme", sorted(resampling.SCHEMES))
+def test_out_and_work_buffers_match(scheme):
+    w = np.random.default_rng(0).random(10000)
+    w /= w.sum()
+    out, work = np.empty(10000, dtype=np.intp), np.empty((2, 10000))
+    idx = resampling.resample(w, scheme, np.random.default_rng(1))
+    got = resampling.get_scheme(scheme)(w, rng=np.random.default_rng(1), out=out, work=work)
+    assert got is out and np.array_equal(idx, out)
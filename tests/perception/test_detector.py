@@ -6,3 +6,65 @@ def test_detector_runs_on_blank_frame():
     blank = np.zeros((480,640,3), dtype=np.uint8)
     blob = det.detect(blank)
     assert blob.visible is False
+
+def _marker_frame(u, v, W=640, H=480):
+    g = np.linspace(30, 255, W, dtype=np.uint8)[None, :, None].repeat(H, 0).repeat(3, 2)
+    cv2.circle(g, (u, v), 15, (30, 30, 200), -1)
+    return g
+
+def test_tracking_mode_matches_full_frame():
+    full, tracked = MarkerDetector(), MarkerDetector(track=True)
+    for k in range(10):
+        frame = _marker_frame(200 + 5 * k, 240 + 3 * k)
+        assert tracked.detect(frame) == full.detect(frame)
+    lost = tracked.detect(np.zeros((480,640,3), dtype=np.uint8))
+    assert lost.visible is False
+    assert tracked.detect(_marker_frame(500, 100)).visible
+
+def test_tracking_reestimates_bounds_every_refresh():
+    det = MarkerDetector(track=True)
+    det.roi_refresh = 3
+    frame = _marker_frame(200, 240)
+    det.detect(frame)
+    first = det._bounds
+    for _ in range(3):
+        assert det.detect(frame).visible and det._bounds is first  # ROI passes
+    assert det.detect(frame).visible and det._bounds is not first  # forced full frame
+
+def test_tracking_refreshes_cached_bounds_every_hsv_refresh():
+    det = MarkerDetector(track=True, cached_bounds=True)
+    det.hsv_refresh, det.roi_refresh = 3, 100
+    frame = _marker_frame(200, 240)
+    det.detect(frame)
+    caches = [det._cache]
+    for _ in range(9):
+        assert det.detect(frame).visible
+        caches.append(det._cache)
+    # ROI frames only, yet the cache was rebuilt every hsv_refresh frames
+    assert det._roi_frames == 9
+    assert [i for i in range(1, 10) if caches[i] is not caches[i - 1]] == [3, 6, 9]
+    assert det._bounds == (caches[-1][0], caches[-1][1])
+
+def test_cached_bounds_match_percentiles():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    det = MarkerDetector(cached_bounds=True)
+    exact = det._auto_hsv_bounds(hsv)
+    cached = det._cached_hsv_bounds(hsv)
+    for a, b in zip(exact, cached):
+        assert np.abs(a.astype(int) - b.astype(int)).max() <= 2
+    assert det._cached_hsv_bounds(hsv)[0] is cached[0]  # reused until refresh
+    frame = _marker_frame(300, 200)
+    assert det.detect(frame) == MarkerDetector().detect(frame)
+
+def test_detect_batch_matches_detect():
+    frames = np.stack([_marker_frame(100 + 40 * k, 120 + 20 * k) for k in range(6)])
+    frames[2] = 0
+    det = MarkerDetector()
+    out = det.detect_batch(frames, workers=3)
+    det.close()
+    for row, frame in zip(out, frames):
+        blob = det.detect(frame)
+        assert (row["u"], row["v"], row["area"], row["visible"]) == (blob.u, blob.v, blob.area, blob.visible)
+    assert not out["visible"][2] and out["visible"].sum() == 5
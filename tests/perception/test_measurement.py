@@ -4,3 +4,24 @@ def test_measurement_invisible():
     m = MeasurementModel()
     obs = m.from_blob(0.0, 0, 0, 0, False)
     assert obs.visible is False and obs.range_m is None
+
+def test_from_blobs_matches_from_blob():
+    import numpy as np
+    m = MeasurementModel()
+    t = np.arange(5) / 30.0
+    u = np.array([320, 100, 0, 600, 400]); v = np.full(5, 240)
+    area = np.array([400, 900, 0, 81, 2500]); vis = area > 0
+    obs = m.from_blobs(t, u, v, area, vis)
+    for i in range(5):
+        o = m.from_blob(t[i], u[i], v[i], area[i], vis[i])
+        assert obs["visible"][i] == o.visible
+        if o.visible:
+            assert np.allclose([obs["bearing_rad"][i], obs["range_m"][i], obs["range_var"][i]],
+                               [o.bearing_rad, o.range_m, o.range_var])
+        else:
+            assert np.isnan(obs["range_m"][i]) and np.isnan(obs["range_var"][i])
+
+def test_bearing_is_positive_to_the_left():
+    m = MeasurementModel()
+    assert m.from_blob(0.0, m.cx - 50, m.cy, 400, True).bearing_rad > 0
+    assert m.from_blob(0.0, m.cx + 50, m.cy, 400, True).bearing_rad < 0
@@ -0,0 +1,11 @@
+import numpy as np
+from batch_pf_estimator import BatchPFEstimator
+
+def test_batch_tracks_each_target():
+    pf = BatchPFEstimator(K=4, N=500, resampling='systematic', seed=0)
+    targets = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.5], [2.0, -1.0]])
+    for _ in range(30):
+        ex, ey, et, traj = pf.update_state(0.0, 0.0, targets[:, 0], targets[:, 1], horizon_steps=10)
+    assert traj.shape == (4, 10, 2)
+    assert np.allclose(np.stack((ex, ey), axis=1), targets, atol=0.2)
+    assert np.allclose(pf.weights.sum(axis=1), 1.0)
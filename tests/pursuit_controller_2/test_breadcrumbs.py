@@ -0,0 +1,38 @@
+import math
+import numpy as np
+from breadcrumbs import BreadcrumbPath
+from pursuit_loop import to_student_frame
+from replay import FakeClock, default_loop, replay_episode, synthetic_episode
+
+def test_buffer_follows_the_student_frame():
+    rng = np.random.default_rng(0)
+    world = np.stack((np.linspace(1.0, 3.0, 50), 0.3 * np.sin(np.linspace(0, 3, 50))), axis=1)
+    crumbs = BreadcrumbPath(capacity=16, spacing=0.0)
+    pose = np.zeros(3)
+    for k in range(50):
+        dd, dtheta = rng.uniform(0, 0.01), rng.normal(0, 0.02)
+        pose = np.array([pose[0] + dd * math.cos(pose[2]), pose[1] + dd * math.sin(pose[2]), pose[2] + dtheta])
+        path = crumbs.update(dd, dtheta, *to_student_frame(pose, world[k]))
+    # the capacity bound keeps the newest points, in order, after compactions
+    expected = np.array([to_student_frame(pose, p) for p in world[-16:]])
+    assert path.shape == (16, 2) and np.allclose(path, expected)
+
+def test_spacing_and_passed_points():
+    crumbs = BreadcrumbPath(spacing=0.1)
+    for x in np.arange(0.5, 1.5, 0.02):
+        crumbs.add(x, 0.0)
+    assert len(crumbs) == 10 and np.all(np.diff(crumbs.path()[:, 0]) >= 0.1 - 1e-9)
+    crumbs.move(1.0, 0.0)  # drove 1 m: the first crumbs are now behind
+    crumbs.drop_passed()
+    assert crumbs.path()[0, 0] <= 0.0 < crumbs.path()[1, 0]
+
+def test_closed_loop_follows_the_teacher_path():
+    def cross_track(breadcrumbs):
+        student, teacher = synthetic_episode(600, kind="arc", seed=0)
+        clock = FakeClock()
+        poses = []
+        replay_episode(student, teacher, loop=default_loop(clock, seed=0, breadcrumbs=breadcrumbs), clock=clock,
+                       closed_loop=True, on_tick=lambda k, pose, t, loop: poses.append(pose[:2]))
+        d = np.hypot(*(np.array(poses)[100:, None, :] - teacher[None, :, :]).transpose(2, 0, 1))
+        return np.sqrt(np.mean(d.min(axis=1) ** 2))
+    assert cross_track(True) < 0.5 * cross_track(False)
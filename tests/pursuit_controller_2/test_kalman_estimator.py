@@ -0,0 +1,42 @@
+import math
+import numpy as np
+from kalman_estimator import EKFEstimator, HybridEstimator, chi2_gate
+from messages.types import PerceptionObs
+
+def test_ekf_tracks_a_static_target_while_the_student_moves():
+    rng = np.random.default_rng(0)
+    ekf = EKFEstimator()
+    px = py = yaw = 0.0
+    for _ in range(100):
+        px, py, yaw = px + 0.01 * math.cos(yaw), py + 0.01 * math.sin(yaw), yaw + 0.002
+        c, s = math.cos(yaw), math.sin(yaw)
+        tx, ty = c * (3.0 - px) + s * (1.0 - py), -s * (3.0 - px) + c * (1.0 - py)
+        out = ekf.update_state(0.01, 0.002, tx + rng.normal(0, 0.1), ty + rng.normal(0, 0.1))
+    assert abs(out[0] - tx) < 0.15 and abs(out[1] - ty) < 0.15 and out[3].shape == (40, 2)
+    assert abs(chi2_gate(2, 0.95) - 5.991) < 1e-3 and abs(chi2_gate(1, 0.95) - 3.841) < 1e-3
+
+def test_ekf_bearing_range_update():
+    ekf = EKFEstimator()
+    obs = PerceptionObs(t=0.0, bearing_rad=math.atan2(0.5, 2.0), range_m=math.hypot(2.0, 0.5),
+                        bearing_var=0.01, range_var=0.01, visible=True)
+    for _ in range(50):
+        est_x, est_y, _, _ = ekf.update_state_obs(0.0, 0.0, obs)
+    assert abs(est_x - 2.0) < 0.05 and abs(est_y - 0.5) < 0.05
+
+def test_hybrid_collapses_and_reexpands():
+    rng = np.random.default_rng(1)
+    hyb = HybridEstimator(N=500, seed=0)
+    meas = lambda x, y: (x + rng.normal(0, 0.1), y + rng.normal(0, 0.1))
+    for _ in range(60):
+        hyb.update_state(0.0, 0.0, *meas(2.0, 0.5))
+    assert hyb.mode == "kf" and hyb.N == 0 and hyb.collapses == 1
+    # occlusion hands back to the particle filter
+    hyb.update_state(0.0, 0.0, math.nan, math.nan)
+    assert hyb.mode == "pf" and hyb.expansions == 1
+    for _ in range(60):
+        hyb.update_state(0.0, 0.0, *meas(2.0, 0.5))
+    assert hyb.mode == "kf"
+    # the teacher jumps: the measurement fails the gate and the particles find it
+    for _ in range(30):
+        est_x, est_y, _, _ = hyb.update_state(0.0, 0.0, *meas(-1.0, 2.5))
+    assert hyb.expansions == 2 and abs(est_x + 1.0) < 0.3 and abs(est_y - 2.5) < 0.3
@@ -0,0 +1,21 @@
+import time
+from perception_pipeline import PerceptionPipeline
+
+def test_slow_perception_does_not_block_ticks():
+    def detect(frame):
+        time.sleep(0.02)
+        return frame
+    pipe = PerceptionPipeline(detect, lambda t, blob: (t, blob))
+    got = []
+    start = time.monotonic()
+    for k in range(30):
+        pipe.submit(k * 0.005, k)
+        obs = pipe.latest()
+        if obs is not None:
+            got.append(obs[1])
+        time.sleep(0.005)
+    elapsed = time.monotonic() - start
+    pipe.close()
+    assert elapsed < 0.3  # ~30 x 5 ms ticks, not 30 x 20 ms detections
+    assert got and got == sorted(got) and pipe.dropped_frames > 0
+    assert pipe.summary()['detect']['p50_ms'] >= 15
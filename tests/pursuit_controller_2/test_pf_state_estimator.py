@@ -0,0 +1,93 @@
+import tracemalloc
+import numpy as np
+from pf_state_estimator import PFEstimator
+
+def test_workspace_mode_matches_default():
+    a = PFEstimator(N=300, seed=3, resampling='systematic')
+    b = PFEstimator(N=300, seed=3, resampling='systematic', workspace=True)
+    for k in range(20):
+        ra = a.update_state(0.05, 0.02, 1.0 + 0.01 * k, 0.3)
+        rb = b.update_state(0.05, 0.02, 1.0 + 0.01 * k, 0.3)
+    assert np.allclose(ra[:2], rb[:2])
+    assert np.allclose(a.particles[:2], b.particles[:2])
+    # resampling in workspace mode allocates nothing N-sized
+    big = PFEstimator(N=50000, seed=0, resampling='systematic', workspace=True)
+    big.resample()
+    tracemalloc.start()
+    big.resample()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 50000 * 8 / 4
+
+def test_log_weights_survive_far_measurement():
+    lin = PFEstimator(N=500, seed=0)
+    log = PFEstimator(N=500, seed=0, log_weights=True)
+    ws = PFEstimator(N=500, seed=0, log_weights=True, workspace=True)
+    ex_lin = lin.update_state(0.0, 0.0, 30.0, 0.0)[0]
+    ex_log = log.update_state(0.0, 0.0, 30.0, 0.0)[0]
+    ex_ws = ws.update_state(0.0, 0.0, 30.0, 0.0)[0]
+    assert abs(ex_lin) < 0.5
+    assert ex_log > 2.0 and np.isclose(ex_log, ex_ws)
+    assert np.isclose(np.exp(log.log_weights).sum(), 1.0)
+
+def test_adaptive_particle_count_follows_spread():
+    tight = PFEstimator(N=2000, seed=0, adaptive=True, measurement_std=0.1, workspace=True)
+    for _ in range(20):
+        tight.update_state(0.05, 0.0, 1.0, 0.0)
+    n_tight = tight.N
+    wide = PFEstimator(N=2000, seed=0, adaptive=True, measurement_std=2.0)
+    assert len(wide.update_state(0.05, 0.0, 1.0, 0.0)) == 4
+    n_wide = wide.N
+    assert n_tight == tight.particles.shape[1] < 400
+    assert n_wide > 5 * n_tight
+
+def test_trajectory_is_vectorized_and_ctrv_follows_arcs():
+    pf = PFEstimator(N=100, seed=0)
+    traj = pf.predict_trajectory(500, (0.0, 0.0, 0.0), turn_rate=0.5)
+    assert traj.shape == (500, 2)
+    # constant turn rate stays on the circle of radius 1 / turn_rate
+    assert np.allclose(np.hypot(traj[:, 0], traj[:, 1] - 2.0), 2.0)
+    assert np.allclose(pf.predict_trajectory(3, (1.0, 0.0, 0.0)), [[1.05, 0], [1.1, 0], [1.15, 0]])
+
+    from replay import synthetic_episode, replay_episode, default_loop, FakeClock
+    student, teacher = synthetic_episode(400, kind='arc', seed=0)
+    clock = FakeClock()
+    loop = default_loop(clock, seed=0, pf_kwargs={'motion': 'ctrv'})
+    replay_episode(student, teacher, loop=loop, clock=clock)
+    assert 0.3 < loop.pf_estimator.turn_rate < 0.7
+    assert loop.pf_estimator.sample_trajectories(40, 25).shape == (25, 40, 2)
+
+def test_bearing_range_update_from_perception_obs():
+    import math
+    from types import SimpleNamespace
+    target = (1.5, 0.5)
+    obs = SimpleNamespace(t=0.0, bearing_rad=math.atan2(target[1], target[0]), range_m=math.hypot(*target),
+                          bearing_var=0.02 ** 2, range_var=0.1 ** 2, visible=True)
+    for kwargs in ({}, {'workspace': True, 'log_weights': True}):
+        pf = PFEstimator(N=2000, seed=0, **kwargs)
+        for _ in range(15):
+            ex, ey, *_ = pf.update_state_obs(0.0, 0.0, obs)
+        assert np.allclose((ex, ey), target, atol=0.15)
+    w = pf.weights.copy()
+    pf.update_state_obs(0.0, 0.0, SimpleNamespace(visible=False))
+    assert np.array_equal(pf.weights, w)
+
+def test_adaptive_shrinks_only_on_low_neff_and_grows_while_occluded():
+    pf = PFEstimator(N=2000, seed=0, adaptive=True)
+    sizes, triggered = [], 0
+    for k in range(200):
+        n_before = pf.N
+        pf.update_state(0.05, 0.01, 1.0 + 0.2 * np.sin(0.05 * k), 0.1)
+        if pf.last_neff < n_before / 2.0:
+            triggered += 1
+        else:
+            assert pf.N >= n_before
+        sizes.append(pf.N)
+    # settles far below the worst-case N, so ticks cost a fraction of it
+    assert 0 < triggered < 200 and np.mean(sizes[50:]) < 500
+    # occluded while turning: no measurement degenerates the weights, but the
+    # cloud spreads and N follows it
+    settled = pf.N
+    for _ in range(200):
+        pf.update_state_obs(0.05, 0.3, None)
+    assert pf.N > 2 * settled and np.isclose(pf.weights.sum(), 1.0)
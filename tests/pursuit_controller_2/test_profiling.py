@@ -0,0 +1,29 @@
+from profiling import TickProfiler, NULL_PROFILER
+from replay import FakeClock, default_loop, replay_episode, synthetic_episode
+
+def test_sections_and_deadline_misses():
+    clock = FakeClock()
+    prof = TickProfiler(budget=0.032, size=8, clock=clock)
+    for k in range(20):
+        with prof.tick():
+            with prof.section("pf_predict"):
+                clock.advance(0.001)
+            clock.advance(0.040 if k % 5 == 0 else 0.010)
+    s = prof.summary()
+    assert s["pf_predict"]["count"] == 20 and abs(s["pf_predict"]["p50_ms"] - 1.0) < 1e-9
+    assert s["tick"]["max_ms"] > 40 and s["deadline"] == {"budget_ms": 32.0, "ticks": 20, "misses": 4}
+    assert "deadline misses: 4/20" in prof.report()
+
+def test_disabled_profiler_records_nothing():
+    student, teacher = synthetic_episode(50, seed=0)
+    clock = FakeClock()
+    replay_episode(student, teacher, loop=default_loop(clock, seed=0), clock=clock)
+    assert NULL_PROFILER.stats == {} and NULL_PROFILER.deadline_misses == 0
+
+def test_loop_stages_are_timed():
+    student, teacher = synthetic_episode(50, seed=0)
+    clock = FakeClock()
+    prof = TickProfiler(budget=0.032)
+    replay_episode(student, teacher, loop=default_loop(clock, seed=0, profiler=prof), clock=clock)
+    for name in ("tick", "pf_predict", "pf_update", "pf_resample", "trajectory", "pid", "pure_pursuit"):
+        assert prof.stats[name].count == 50
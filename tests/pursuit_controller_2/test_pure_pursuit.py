@@ -0,0 +1,23 @@
+import numpy as np
+from pure_pursuit import PurePursuit
+
+def test_goal_is_lookahead_intersection():
+    pp = PurePursuit(L_d=1.0)
+    path = [(0.1 * i, 0.3) for i in range(40)]
+    xg, yg = pp._find_goal_point(path)
+    assert np.isclose(np.hypot(xg, yg), 1.0) and np.isclose(yg, 0.3)
+    # never crosses the circle: nearest sample to L_d
+    assert pp._find_goal_point([(0.1, 0.0), (0.2, 0.1)]) == (0.2, 0.1)
+
+def test_batch_matches_single():
+    pp = PurePursuit(L_d=1.0)
+    t = np.linspace(0.0, 3.0, 300)
+    paths = np.stack([np.stack((t, a * t * t), axis=1) for a in (-0.5, 0.0, 0.4, 3.0)])
+    paths[3] += (1.5, 0.0)  # starts outside the lookahead circle
+    v = np.array([0.5, 0.8, 1.0, 0.3])
+    assert np.allclose(pp.update_batch(v, paths), [pp.update(vi, p) for vi, p in zip(v, paths)])
+
+def test_empty_paths_give_zero_turn_rate():
+    pp = PurePursuit(L_d=1.0)
+    assert pp.update(0.5, []) == 0.0
+    assert np.array_equal(pp.update_batch(np.array([0.5, 0.8]), np.zeros((2, 0, 2))), [0.0, 0.0])
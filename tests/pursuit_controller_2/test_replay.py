@@ -0,0 +1,15 @@
+import numpy as np
+from replay import synthetic_episode, replay_episode
+
+def test_replay_is_headless_and_reproducible():
+    student, teacher = synthetic_episode(300, kind='arc', seed=1)
+    a = replay_episode(student, teacher, seed=2)
+    b = replay_episode(student, teacher, seed=2)
+    assert a.ticks == 300 and a.ticks_per_sec > 0
+    assert np.array_equal(a.v, b.v) and np.array_equal(a.w, b.w)
+    assert a.est_rmse < 0.4
+
+def test_closed_loop_moves_student():
+    student, teacher = synthetic_episode(300, kind='straight', seed=1)
+    r = replay_episode(student, teacher, seed=2, closed_loop=True)
+    assert r.v.max() > 0.0 and np.isfinite(r.gap_rmse)
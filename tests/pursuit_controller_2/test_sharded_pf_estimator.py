@@ -0,0 +1,31 @@
+import os
+import numpy as np
+from sharded_pf_estimator import ShardedPFEstimator, _shard_draws
+
+def test_shard_draws_match_global_systematic_resampling():
+    rng = np.random.default_rng(0)
+    N = 1000
+    w = rng.random(N) ** 4
+    u0 = 0.37
+    expected = np.searchsorted(np.cumsum(w), (np.arange(N) + u0) * w.sum() / N, side="right")
+    bounds = [0, 1, 250, 251, 700, N]
+    sums = np.array([w[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:])])
+    prefix = np.concatenate(([0.0], np.cumsum(sums)))
+    got = np.empty(N, dtype=np.intp)
+    next_j = 0
+    for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        j_lo, j_hi, idx = _shard_draws(w[a:b], prefix[k], prefix[k + 1], prefix[-1], N, u0)
+        assert j_lo == next_j
+        got[j_lo:j_hi] = a + idx
+        next_j = j_hi
+    assert next_j == N and np.array_equal(got, expected)
+
+def test_sharded_estimator_tracks_and_releases_memory():
+    rng = np.random.default_rng(1)
+    with ShardedPFEstimator(N=20000, workers=2, seed=0) as pf:
+        name = pf._shm.name
+        for _ in range(20):
+            est_x, est_y, _, path = pf.update_state(0.0, 0.0, 2.0 + rng.normal(0, 0.1), 0.5 + rng.normal(0, 0.1))
+        assert abs(est_x - 2.0) < 0.2 and abs(est_y - 0.5) < 0.2 and path.shape == (40, 2)
+        assert np.allclose(pf.particles @ pf.weights, pf.est, atol=0.02)
+    assert not os.path.exists(os.path.join("/dev/shm", name.lstrip("/")))
@@ -0,0 +1,10 @@
+from sweep import make_grid, run_sweep
+
+def test_sweep_is_parallel_and_reproducible():
+    grid = make_grid(kp=[0.5, 2.0], lookahead=[1.0])
+    a = run_sweep(grid, episodes=1, steps=150, seed=3, workers=2)
+    b = run_sweep(grid, episodes=1, steps=150, seed=3, workers=1)
+    assert [r['kp'] for r in a] == [0.5, 2.0]
+    for ra, rb in zip(a, b):
+        assert ra['gap_rmse'] == rb['gap_rmse'] and ra['effort'] == rb['effort']
+        assert ra['us_per_tick'] > 0
@@ -0,0 +1,16 @@
+import numpy as np
+from replay import synthetic_episode, replay_episode
+from trajectory_log import TrajectoryLogWriter, TrajectoryLog
+
+def test_log_roundtrip_through_replay(tmp_path):
+    path = str(tmp_path / "run.ptlog")
+    student, teacher = synthetic_episode(2500, seed=0)
+    with TrajectoryLogWriter(path, meta={"timestep_ms": 32}, block_rows=1000) as log:
+        r = replay_episode(student, teacher, seed=0,
+                           on_tick=lambda k, pose, tp, loop: log.append_tick(k * 0.032, pose, tp, loop))
+    run = TrajectoryLog(path)
+    assert len(run) == 2500 and run.meta["timestep_ms"] == 32
+    assert isinstance(run.records, np.memmap)
+    assert np.array_equal(run["v_desired"], r.v)
+    assert np.allclose(run["teacher_x"], teacher[:, 0])
+    assert np.isnan(run["obs_range"]).all() and (run["n_particles"] == 200).all()